@@ -1,23 +1,35 @@
 # app.py
 import subprocess
-import ffmpeg
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context, url_for
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
+import json
+import math
+import shutil
+import time
 import logging
 import uuid
-from moviepy import VideoFileClip, AudioFileClip, concatenate_videoclips
 
-from gtts import gTTS
+# Load environment variables before the local modules below read their configuration
+load_dotenv()
 
 # Import helper functions and configurations
-from helpers import upload_to_s3, download_social_video, get_video_duration, download_video, generate_script, process_AI_video
+from helpers import upload_to_s3, upload_many, stream_url_to_s3, stream_social_video_to_s3, download_social_video, get_video_duration, download_video, generate_script, process_AI_video, MP4_AUDIO_CODECS
+from pipeline import segment_and_upload
+from download_cache import normalize_url, get_download_cache
+from singleflight import SingleFlight
+from jobs import job, JobError, get_job_backend
+from progress import hub as progress_hub
+from background import get_background_clip, BACKGROUND_FPS
+from media_probe import probe
+from tts import get_tts_backend, synthesize_speech
+from tts_cache import get_tts_cache
+import models
+from models import init_db, list_videos_page, get_video, encode_cursor, dumps, cache_stats, InvalidCursor
+from bson import ObjectId
 import instaloader
 
-# Load environment variables
-load_dotenv()
-
 # Setup logging
 logging.basicConfig(level=logging.DEBUG)
 
@@ -33,55 +45,196 @@ AWS_ACCESS_KEY = os.getenv('AWS_ACCESS_KEY')
 AWS_SECRET_KEY = os.getenv('AWS_SECRET_KEY')
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MONGO_URI'] = os.getenv('MONGO_URI')
+
+# Video records are stored only when a MongoDB is configured
+if app.config['MONGO_URI']:
+    init_db(app)
 
 # Ensure the upload folder exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Concurrent identical pipeline requests are coalesced onto a single run
+_pipeline_flights = SingleFlight()
+
+# Queue a registered job and answer right away with its id; clients poll GET /jobs/<id>
+def submit_job(name, **kwargs):
+    job_record = get_job_backend().submit(name, kwargs)
+    return jsonify({
+        'jobId': job_record.id,
+        'status': job_record.status,
+        'statusUrl': url_for('get_job', job_id=job_record.id)
+    }), 202
+
 # Routes
 @app.route('/')
 def index():
     return render_template('index.html')
 
+# Endpoint: Status and result of a background job
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job_record = get_job_backend().get(job_id)
+    if not job_record:
+        return jsonify({'error': 'Job not found.'}), 404
+    return jsonify(job_record.to_dict())
+
+# Endpoint: Server-Sent Events stream of a job's progress, ending with a 'done' event carrying the job status
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def get_job_events(job_id):
+    backend = get_job_backend()
+    if not backend.get(job_id):
+        return jsonify({'error': 'Job not found.'}), 404
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        last_event_id = 0
+
+    def stream():
+        if progress_hub.has(job_id):
+            for item in progress_hub.subscribe(job_id, after=last_event_id):
+                if item is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                seq, event, payload = item
+                yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+        else:
+            # Jobs run elsewhere (Celery) only expose their status, so follow that
+            status = None
+            while True:
+                job_record = backend.get(job_id)
+                if job_record is None:
+                    # The result expired from the backend while we were following it
+                    yield f"event: done\ndata: {json.dumps({'error': 'Job not found.'})}\n\n"
+                    return
+                if job_record.status in ('succeeded', 'failed'):
+                    yield f"event: done\ndata: {json.dumps(job_record.to_dict())}\n\n"
+                    return
+                if job_record.status != status:
+                    status = job_record.status
+                    yield f"event: status\ndata: {json.dumps({'status': status})}\n\n"
+                time.sleep(2)
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Endpoint: Processed videos, newest first, one page per request.
+# ?limit= (default 20, at most 100), ?cursor= (the nextCursor of the previous page) and optionally ?status=.
+# Each page (at most limit + 1 projected documents) is read through the in-memory page cache and
+# written out document by document.
+@app.route('/list-videos', methods=['GET'])
+def list_videos():
+    if models.mongo is None:
+        return jsonify({'error': 'Video storage is not configured.'}), 503
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer.'}), 400
+    try:
+        # One extra video tells whether another page follows
+        videos = list_videos_page(limit + 1, request.args.get('cursor'), status=request.args.get('status'))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        yield b'{"videos": ['
+        next_cursor = None
+        for index, video in enumerate(videos):
+            if index == limit:
+                next_cursor = encode_cursor(last_video)
+                break
+            # Documents go out as read (projected fields, _id as a string), without building new dicts
+            yield (b',' if index else b'') + dumps(video)
+            last_video = video
+        yield b'], "nextCursor": ' + dumps(next_cursor) + b'}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+# Endpoint: One video by id (the _id from /list-videos), read through the in-memory video cache
+@app.route('/video/<video_id>', methods=['GET'])
+def get_video_by_id(video_id):
+    if models.mongo is None:
+        return jsonify({'error': 'Video storage is not configured.'}), 503
+    if not ObjectId.is_valid(video_id):
+        return jsonify({'error': 'Invalid video id.'}), 400
+    video = get_video(ObjectId(video_id))
+    if video is None:
+        return jsonify({'error': 'Video not found.'}), 404
+    return Response(dumps(video), mimetype='application/json')
+
+# Endpoint: Hit rates of the in-process caches, for sizing them
+@app.route('/cache-stats', methods=['GET'])
+def get_cache_stats():
+    stats = cache_stats()
+    download_cache = get_download_cache()
+    tts_cache = get_tts_cache()
+    if download_cache is not None:
+        stats['downloads'] = download_cache.stats()
+    if tts_cache is not None:
+        stats['tts'] = tts_cache.stats()
+    return jsonify(stats)
+
 # Endpoint: Process video into segments and upload
 @app.route('/process-video', methods=['POST'])
 def process_video():
     data = request.json
     video_url = data.get('url')
     segment_length = data.get('segment_length')
+    # Exact boundaries force keyframes (video re-encode); otherwise cuts are keyframe-aligned stream copies
+    exact_segments = bool(data.get('exact_segments', False))
 
     if not video_url or not segment_length:
         return jsonify({'error': 'Missing video URL or segment length.'}), 400
 
-    video_file = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}.mp4")
     try:
-        # Download video
-        download_social_video(video_url, video_file)
-
-        # Get video duration
-        video_duration = get_video_duration(video_file)
-        segment_urls = []
-
-        # Split and upload video segments
-        for start_time in range(0, int(video_duration), int(segment_length)):
-            end_time = min(start_time + int(segment_length), video_duration)
-            segment_file = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_segment.mp4")
-            subprocess.run([
-                'ffmpeg', '-i', video_file, '-ss', str(start_time), '-to', str(end_time), '-c', 'copy', segment_file
-            ], check=True)
-
-            s3_url = upload_to_s3(segment_file, os.path.basename(segment_file))
-            if s3_url:
-                segment_urls.append(s3_url)
+        segment_length = int(segment_length)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Segment length must be a number of seconds.'}), 400
+    if segment_length <= 0:
+        return jsonify({'error': 'Segment length must be a positive number of seconds.'}), 400
+
+    return submit_job('process-video', video_url=video_url, segment_length=segment_length, exact_segments=exact_segments)
+
+@job('process-video', error_message='Failed to process video')
+def process_video_job(video_url, segment_length, exact_segments=False):
+    # Identical requests already running share that run's result
+    flight_key = ('process-video', normalize_url(video_url), segment_length, exact_segments)
+    segment_urls, _ = _pipeline_flights.do(
+        flight_key, lambda: run_process_video(video_url, segment_length, exact_segments))
+    return {'videoSegments': segment_urls}
+
+# Download, segment and upload a video. Returns the segment URLs in order.
+# With a database configured the run is recorded as a video: "processing" while it runs, then
+# "completed" with its segment URLs or "failed".
+def run_process_video(video_url, segment_length, exact_segments=False):
+    video_id = models.start_video(video_url, segment_length) if models.mongo is not None else None
+    try:
+        segment_urls, duration = _segment_video_url(video_url, segment_length, exact_segments)
+    except Exception:
+        if video_id is not None:
+            models.update_video_status(video_id, 'failed')
+        raise
+    if video_id is not None:
+        models.update_video_status(video_id, 'completed', file_urls=segment_urls, video_length=duration)
+    return segment_urls
+
+def _segment_video_url(video_url, segment_length, exact_segments):
+    video_file = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}.mp4")
 
-            os.remove(segment_file)
+    # Download video
+    download_social_video(video_url, video_file)
 
-        os.remove(video_file)
+    # Duration and expected number of segments, for progress reporting
+    duration = get_video_duration(video_file)
+    total_segments = math.ceil(duration / segment_length)
 
-        return jsonify({'videoSegments': segment_urls})
+    # Split the video in a single ffmpeg pass while worker threads upload finished segments
+    uploaded = segment_and_upload(video_file, segment_length, UPLOAD_FOLDER, upload_to_s3, exact=exact_segments,
+                                  total=total_segments, duration=duration)
+    segment_urls = [s3_url for s3_url in uploaded if s3_url]
 
-    except Exception as e:
-        logging.error(f"Error processing video: {e}")
-        return jsonify({'error': 'Failed to process video', 'details': str(e)}), 500
+    os.remove(video_file)
+    return segment_urls, duration
 
 @app.route('/download-instagram', methods=['POST'])
 def download_instagram():
@@ -91,28 +244,42 @@ def download_instagram():
     if not post_url:
         return jsonify({'error': 'Missing Instagram post URL.'}), 400
 
+    return submit_job('download-instagram', post_url=post_url)
+
+@job('download-instagram', error_message='Failed to download Instagram post')
+def download_instagram_job(post_url):
+    # Download Instagram post
+    instaloader_instance = instaloader.Instaloader()
+    shortcode = post_url.split('/')[-2]
+    post = instaloader.Post.from_shortcode(instaloader_instance.context, shortcode)
+
+    # Reels and video posts expose a direct MP4 URL that can be streamed straight into S3
+    if post.is_video and post.video_url:
+        try:
+            s3_url = stream_url_to_s3(post.video_url, f"{uuid.uuid4().hex}.mp4")
+            return {'videoUrl': s3_url}
+        except Exception as e:
+            logging.warning(f"Streaming upload failed, falling back to disk download: {e}")
+
+    # Each job downloads into its own folder, so only this post's files get picked up
+    download_folder = os.path.join(UPLOAD_FOLDER, "instagram", uuid.uuid4().hex)
+    os.makedirs(download_folder, exist_ok=True)
     try:
-        # Download Instagram post
-        instaloader_instance = instaloader.Instaloader()
-        shortcode = post_url.split('/')[-2]
-        post = instaloader.Post.from_shortcode(instaloader_instance.context, shortcode)
-        download_folder = os.path.join(UPLOAD_FOLDER, "instagram")
-        os.makedirs(download_folder, exist_ok=True)
         instaloader_instance.download_post(post, target=download_folder)
 
-        # Find and upload the video
-        video_file = next(
-            (file for file in os.listdir(download_folder) if file.endswith('.mp4')), None)
-        if video_file:
-            video_path = os.path.join(download_folder, video_file)
-            s3_url = upload_to_s3(video_path, video_file)
-            os.remove(video_path)
-            return jsonify({'videoUrl': s3_url})
-        else:
-            return jsonify({'error': 'No video found in post.'}), 500
-    except Exception as e:
-        logging.error(f"Error downloading Instagram post: {e}")
-        return jsonify({'error': 'Failed to download Instagram post', 'details': str(e)}), 500
+        # Upload every video of the post (a carousel can hold several) concurrently
+        video_paths = sorted(os.path.join(download_folder, file)
+                             for file in os.listdir(download_folder) if file.endswith('.mp4'))
+        if not video_paths:
+            raise JobError('No video found in post.')
+        results = upload_many(video_paths, [f"{shortcode}_{os.path.basename(path)}" for path in video_paths])
+    finally:
+        shutil.rmtree(download_folder, ignore_errors=True)
+
+    video_urls = [result.url for result in results if result.url]
+    if not video_urls:
+        raise results[0].error
+    return {'videoUrl': video_urls[0], 'videoUrls': video_urls}
 
 @app.route('/download-facebook', methods=['POST'])
 def download_facebook():
@@ -125,29 +292,44 @@ def download_facebook():
     if not video_url:
         return jsonify({'error': 'Missing Facebook video URL.'}), 400
 
-    try:
-        # Generate a unique filename for the downloaded video
-        video_file = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}.mp4")
+    return submit_job('download-facebook', video_url=video_url)
 
-        # Download the Facebook video using yt-dlp
-        download_social_video(video_url, video_file)
+@job('download-facebook', error_message='Unexpected error occurred')
+def download_facebook_job(video_url):
+    # Identical requests already running share that run's upload
+    s3_url, _ = _pipeline_flights.do(('download-facebook', normalize_url(video_url)),
+                                     lambda: run_download_facebook(video_url))
+    return {'videoUrl': s3_url, 'message': 'Facebook video downloaded and uploaded successfully.'}
 
-        # Verify the file was downloaded
-        if not os.path.exists(video_file):
-            return jsonify({'error': 'Failed to download Facebook video.'}), 500
+# Get a Facebook video into S3 and return its URL
+def run_download_facebook(video_url):
+    # Generate a unique filename for the downloaded video
+    video_file = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}.mp4")
 
-        # Upload the video to AWS S3
-        s3_url = upload_to_s3(video_file, os.path.basename(video_file))
+    # Stream the video straight into S3 when it is a single file and not already in the download cache
+    try:
+        s3_url = stream_social_video_to_s3(video_url, os.path.basename(video_file))
+    except Exception as e:
+        logging.warning(f"Streaming upload failed, falling back to disk download: {e}")
+        s3_url = None
+    if s3_url:
+        return s3_url
 
-        # Remove the local file after upload
-        if os.path.exists(video_file):
-            os.remove(video_file)
+    # Download the Facebook video using yt-dlp (served from the download cache when possible)
+    download_social_video(video_url, video_file)
 
-        return jsonify({'videoUrl': s3_url, 'message': 'Facebook video downloaded and uploaded successfully.'})
+    # Verify the file was downloaded
+    if not os.path.exists(video_file):
+        raise JobError('Failed to download Facebook video.')
 
-    except Exception as e:
-        logging.error(f"Error downloading Facebook video: {e}")
-        return jsonify({'error': 'Unexpected error occurred', 'details': str(e)}), 500
+    # Upload the video to AWS S3
+    s3_url = upload_to_s3(video_file, os.path.basename(video_file))
+
+    # Remove the local file after upload
+    if os.path.exists(video_file):
+        os.remove(video_file)
+
+    return s3_url
 
 # Endpoint to generate video from any website URL
 @app.route('/generate-ai-video', methods=['POST'])
@@ -160,189 +342,115 @@ def generate_video():
     if not video_url or not segment_length:
         return jsonify({'error': 'Missing video URL or segment length.'}), 400
 
-    try:
-        # Download video
-        video_file = download_video(video_url)
+    return submit_job('generate-ai-video', video_url=video_url, segment_length=segment_length)
 
-        if not video_file:
-            return jsonify({'error': 'Failed to download video.'}), 500
+@job('generate-ai-video', error_message='Failed to generate video')
+def generate_video_job(video_url, segment_length):
+    flight_key = ('generate-ai-video', normalize_url(video_url), segment_length)
+    s3_url, _ = _pipeline_flights.do(flight_key, lambda: run_generate_ai_video(video_url, segment_length))
+    return {'videoUrl': s3_url, 'message': 'Video generated and uploaded successfully.'}
 
-        # Generate AI script (from template or basic logic)
-        script = generate_script(video_url)
+# Download a video, add a generated voice-over and upload the result. Returns the S3 URL.
+def run_generate_ai_video(video_url, segment_length):
+    # Download video
+    video_file = download_video(video_url)
 
-        # Process video segments with audio
-        processed_video_file = process_AI_video(video_file, segment_length, script)
+    if not video_file:
+        raise JobError('Failed to download video.')
 
-        if not processed_video_file:
-            return jsonify({'error': 'Failed to process video.'}), 500
+    # Generate AI script (from template or basic logic)
+    script = generate_script(video_url)
 
-        # Upload to S3
-        s3_url = upload_to_s3(processed_video_file, os.path.basename(processed_video_file))
+    # Process video segments with audio
+    processed_video_file = process_AI_video(video_file, segment_length, script)
 
-        # Clean up local files
-        os.remove(video_file)
-        os.remove(processed_video_file)
-
-        return jsonify({'videoUrl': s3_url, 'message': 'Video generated and uploaded successfully.'})
-    except Exception as e:
-        logging.error(f"Error generating video: {e}")
-        return jsonify({'error': 'Failed to generate video', 'details': str(e)}), 500
+    if not processed_video_file:
+        raise JobError('Failed to process video.')
 
+    # Upload to S3
+    s3_url = upload_to_s3(processed_video_file, os.path.basename(processed_video_file))
 
-def generate_audio_from_script(script_text):
-    try:
-        tts = gTTS(script_text, lang='en')
-        audio_filename = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_audio.mp3")
-        tts.save(audio_filename)
-        return audio_filename
-    except Exception as e:
-        logging.error(f"Error generating audio: {e}")
-        return None
-    
+    # Clean up local files
+    os.remove(video_file)
+    os.remove(processed_video_file)
 
-def get_audio_duration(audio_file):
-    try:
-        # Probe the audio file using ffmpeg to get detailed information
-        audio_info = ffmpeg.probe(audio_file,cmd='ffprobe', v='error', select_streams='a:0', show_entries='stream=duration')
-        
-        # Extract the duration from the probe output
-        audio_duration = float(audio_info['streams'][0]['duration'])
-        
-        return audio_duration
-    except ffmpeg.Error as e:
-        # Handle any error related to ffmpeg
-        print(f"Error getting audio duration: {e.stderr.decode()}")
-        return None
-    except Exception as e:
-        # Catch any other exceptions
-        print(f"Unexpected error: {e}")
-        return None
+    return s3_url
 
 
-# Function to create a black screen video
-def create_video_from_audio(audio_file):
+def generate_audio_from_script(script_text):
     try:
-        # Step 1: Get the audio duration
-        audio_duration = get_audio_duration(audio_file)
-        if not audio_duration:
-            raise ValueError("Failed to retrieve audio duration.")
-        
-        # Step 2: Create a video filename using UUID
-        video_filename = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_video.mp4")
-        
-        # Step 3: Create a black screen video with the same duration as the audio
-        ffmpeg_command = [
-            'ffmpeg', '-f', 'lavfi', '-t', str(audio_duration),
-            '-i', 'color=c=black:s=1280x720', '-vcodec', 'libx264', '-an', video_filename
-        ]
-        
-        # Execute the ffmpeg command to create the video
-        subprocess.run(ffmpeg_command, check=True)
-
-        # input = ffmpeg.input(audio_file)
-        # audio = input.audio.filter("aecho", 0.8, 0.9, 1000, 0.3)
-        # video = input.video.hflip()
-        # out = ffmpeg.output(audio, video, video_filename)
-
-        
-        # Return the created video filename
-        return video_filename
-
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error creating video: {e.stderr}")
-        return None
-    except ValueError as e:
-        logging.error(f"ValueError: {e}")
-        return None
+        backend = get_tts_backend('gtts')
+        audio_filename = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_audio{backend.extension}")
+        return synthesize_speech(script_text, audio_filename, backend)
     except Exception as e:
-        logging.error(f"Unexpected error creating video: {e}")
+        logging.error(f"Error generating audio: {e}")
         return None
-# Function to combine the video and audio
-def combine_audio_and_video(video_file, audio_file):
-    try:
-        # Generate the final video filename using UUID
-        final_video_file = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_final_video.mp4")
-        
-        # # Combine the video and audio using ffmpeg
-        # ffmpeg_command = [
-        #     'ffmpeg', '-i', video_file, '-i', audio_file,
-        #     '-vcodec', 'libx264', '-acodec', 'aac', '-strict', 'experimental', final_video_file
-        # ]
-        
-        # # Run the ffmpeg command
-        # subprocess.run(ffmpeg_command, check=True)
-
-        video_clip = VideoFileClip(video_file)
-        audio_clip = AudioFileClip(audio_file)
-        video_clip.save_frame('data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD/2wCEAAkGBxISEhUSEhISFRISFRUVFRUVFRUVEBUVFRUWFxUVFRUYHiggGBolHRUVITEhJSkrLi4uFx8zODMtNygtLisBCgoKDg0OGhAQGi0lHiYtLS0tLS0tLS0tLS0tKy0tLS0tLi0tLS0tLS0tLS0tKy0tLi0tLS0tLS0tLSstLS0tLf/AABEIALcBEwMBIgACEQEDEQH/xAAcAAAABwEBAAAAAAAAAAAAAAAAAQIDBAUGBwj/xAA/EAABAwIEAwUFBwQABQUAAAABAAIDBBEFEiExBkFREyJhcYEykaGxwQcUI0JScoIzYtHwFSRDkuFTc6Kys//EABoBAAMBAQEBAAAAAAAAAAAAAAABAgMEBQb/xAAiEQACAgICAgMBAQAAAAAAAAAAAQIRAyESMRNBBDJRYSL/2gAMAwEAAhEDEQA/AMxw/GY6lmYEb7rZY84zlrG7DUlXsuBxk5soS48Pa29gs80nGLcexwin2VPC8WRzmpjGh/zLfT5q4wykIkebaFZ3iOQirZ42+arFJuCcuzOSp6NNiY/Bd5JqhivGPJPYifwHftQws3ib5LQXsraei3PiVBfh4Ljcc1oaVvd9SmpIdT5qJQKUigoMKDnjTYrf0eGtDNuSpMGg19Vp4X6WS4lcrMPxNgwJuFkqmg+7ua4aa6+K6tU0+cqk4g4eEjQFEo10VGW9mi4cmzxsPUBXgaqzh6jEcTW9AArmy1T0RQw4I2A9EuRFGgYsBBGiKAEEnogCeiNEmIVdEXIroXQAMx6IwUSCAFJNz0R3QSGECgQjQQAhwSDfonURCLEMlqSWp4hFZOxUM69EVkqSUDdQK3FGMBu4D1RYMfMwQXPq7jGMSOANxfdBZ+aJNkfD+L43G2YA3tYrW0rg9ubwXCHxd/8Al9V2mieW0gI3y/RaNApFnTFmtjuq+vwRsjw4i5B3WL4c4ikfUdk4EanXyK6LWVojjDiUh2mQcZoj2Lmt3IsomCwObG1rhrayu6WpbK2/IpeVo0HJDGlshMo7MJUJx3V/JHdtlST0bhqpxuVf6CSXoewhuvqryMbqnwhpG/VXDXWurYRGiLFR8YkLWgjdHLUAJnEpA5qTGmPYFjjZBlvZw0IWijdcbrk8maKTO3kbrbYJjrJABfvcxzUJ/pT/AIaJ6KNNskulgqxD1vFFl8UAUaACsiLUq6K6AEZPFGGpaK6ACsiy+KVdBACcvijsjQugBJCLL4pV0CUAJCBRF4QugBJHiiI8UuyRJskIxPH2MOgjuw94mw+q5TX41LJcvcT8vctt9ospdK1nK17rEihuVhPbM32Vrqrw+KCtv+FoKP8AIiBM3vfy+q7DRj/lB+z6KDUcFRO/LZaFmHZYcg6WXcNI5Rw2y1aPN3zW547Zeldboq3D+FHx1Akvpcn3rQcVUTpKctaNbIEuiHwi8/dmEm5y80eDYkXySAj2X2TvDlK9kDWuFiAoOBxESzXH5/olQ76NI3ERny+Clue12izDm/jHyCkmZwI16pUVyL9kbQnLbqso5i53oFZvdZFDTM/jUmTXoq04y0jcKVxAc7XLLU2GOPiT8Eya/CbUVrXHQqThMZEgc1Ck4bI1Wiwqjyu1GqiWyo2i8oJtBdT9FGp4QOSkaBF0tldjkbk9dQ8yTfwKzeUriSy5vgjaRysoZNt9PNMioYTYPaT0Dhf3BLyv8HxLRAhQoqkg2de3XmFMBWkZKXRLVAyhBBFm8CqEGiyhDN4FGUANk2UOurAwXJUqfZZDiar0yi/ionPirJk6FzcStB5lXNFibHgG4XNchurKnqC0brlfyaJTZ0F1c0DcKHLijTsbrCV+JOta6YwLFcri1xvfZXDPyY3IjcbPJfmO52CzVDPrYq34uqsz/NZ2iuXH5KMj7ILN9RYoKLJugsgs7q16cDgkBiU1h6henZrQsMalPiDkTWFLDUWFCG0wtZMMw5ovoNVLsUoXSsVFW/CWlxNtVHmwjpyV+iITsOJR0tEWuupszLqY5nkksaixUZuqoyQ64TFHQZACtW+AJs0mltErHRXte0eaXHa6VNh10mGkLTuigssmPsEUkgaC5xAaBckmwA5klRy+x1IAA1v0XK+NOK/vJLA7LSxnrYSEfmf4dB672tz08k6RtajGzSY59oTWkspWB5GnaPvk/i3d3mbeqylXxNVyavqXgf2u7NvlZtlnzMcuckRRDeST2j+xh+bvcVUVXE7Wm1Owl23ay6u/i3kPDQeC2XGOoq2Rxb3J0axokl5Od/dI4ge43d8PVSmYQ47yAftYNPVxPyXNqjG6iTeWW3Rrsg/+NkxHJMSA10xcdvxH3+amXkfuil416s7NTy1sYyx18thsHshkHl3m3t6qfT8XYnD7TKWqYOQzU83obuYfcFyc1dfS5SZHlthcPOdvlc6rWcMcVMqTke3JN0Hsu/bf5LBvJD/XaNuOOWqo6Zgv2iUc7hFLnpZzoI6gBocf7JB3Xe8HwWuXI66hjmZklY17fHceIPL/AHxUPB+JqnCHtZIX1GHE21701Pf9JO7R+nbpY6HXHnU9ezPJicN9o7O42UCqrg3cpymro5o2yxPa+ORoc1wN2uB2IVPjNPcEhVNtLRiIreIGAb6rIV1cZHE3R1cTrqDJHbmuHJKUlshj0Zum6mayDX2USsmBCzUGwI1RNm0Gqjdm5veHJFA/UjqnKiUWtf4rpx4tEsq6itDjY7p7A3NEhvbXZVrqW7idbEpRgI1BIISemBqZY4r7NQWNc6W/tlBb8UKz0W86JuleSU8GpMbdVubD0h0RwORubdFEwIAUXapZKSWpZCQABRgpOQIw1AAcUlgSnJACAHboXTRajCAHE3IQNTsOfJRcYxOKmhfNM7LGwa8ySdA1o/M4mwAG5KxGI4HiOJ61D20lGdRTBxdO8cvvBGn8AbBDaQ0rG+KuOIXiWno2/eHua6N0oOWljJFjeT85tybfzC5vXGOlaJZj2kv5BazQf7GbD9xuV1aPgaINDGTgZdLCMWHkA5ca41wiZlbLG53bCPLZzGkMDS0ENsdj1WEbk66R0NKKvtlDW1sk7i6Q6DUN/K3yH1SqeC9veVJoqSRwDGtu9xAANrDUXJJ2A6rVzcNgkFj2gZWg7nM4AZjryJvouhL8MG17M/BSt0vsPj0C6Nwhw4xrBK9oL3i/kOQCz9Hw9mqGguZkcbkAnubk76nTQea6rROhFow5ufYNuMx0vYDfZZZL6NcdfYzWO4QyRhaWjZciqqZ0EptcOjdvz02PuXeKyupr2M0YJ/uC5ZxvA0VBLSCHNuCLWPr6KMetM0yU9o2WC1nawsk/U0H1IJ+bT7ypFVA14LHC7XAgg8xr/j4rP8DVOaDL+glvpqR/9j7lop5Q1pc7QNBJPgL3+q45KpUbp2it+y3EpIZamgveOF5ezwBdZw9e6fMlb+vrtNVifsjoXS/eq540nkLI/FrCczvebfxWox9ulgF3uLZ5+rZQ1lSL6c0cdI5/sj/CsaHCA4XI1Wjw+ja2wsp8VkNGNfg8hH/hUtThz82U3XW5WN5/74KoxamDm3tqNkeFLoSjs5fVULmJttDm16fFbCroC47JkYURohwaKcVZBpeFc7QRfxUp/CAynU38Vq8KmAaAdFOmqW2WTivZSin0cbqMCla4i17FBdAnlZmPmjXSkifCzWXSGvF0C5NtlF1oBMzI41HfUBIZVhIZMc4Iy8KvfWJL61K0FMs8yIyBVZq0n7wUuSHxZZPnHVJZOFXF5KNt0ch8SxdME26qCiWKVHFc6o5BxIFdhn3mpgkksYKbNIxh2dUHutef2NDreL78lY1LI3XYXuv1DrEeXL4KXUDTWwHhuqupxWFh7PugONrH8x357nRYSlvZ0Y460Y3HuBal1n09fM+zi7LI/KT0F2DKbctAsBWYZJSyuNU2QySajtXXFgfyEGxHLc2XWcYbUxkS0dpWC+eBzssnnE86H9rt+vJZHG+KHYg1lFHSTCYyBxEgYHAtDiQ3XQ2vvbS60xy/hGWHuzE4dhD5HEU4u52pzvIjYy9ycwuQO6OauG0MdrCSomI0JhuIb9A5x196ew6nlE0lI9pjaLOmabB5DdcmYE903Zsed1opgxreW2gGgHgAFvdHK0ZiHDxnaWSSsmaczWTZu+ADdrTe1zprrbXTmBhWBunfUT+zIxwe83c2S4DnXBaO5bIdTzQxmub7B2J9Wnk5vQqx4FoKaqdM2pzmRrQW5TYlpvqTzILdAdLW3SbXZUU5f5RXYZV5Wdq/D2Ohc8sY8yDM4tLgfaOp7h5cvEXjcVxNzMcyMsDmHukEWOm1/NUtfma2RxzOYP6LQS0NleMufTla+mxNvG+x+0KMdjSv7tyA05SCLlgNgRoRcLHIqZ0YblFpkbgH848irHiQSVMsWHQH8SoN5HD/AKcQ9px9PoOazHDNeYM5DS91iGtAuXO2AXWPs+4ZfTNfU1OtZU2L+YjZu2Jvlz8fJZRx3PkypzqPFGlwzDmU8LIYxaOJoa0eAHzTNVTBytAURaumzmor6ePKnnJ1zU0QmIaludykuF9zdOFIJQAyKcInRhOEpsuQBDqIL7KqrqeS2jir1zk1KLhFBW7Mg6GRBabsQglwNPKxTsRJSW1LlEYE+xqztlUh8zOKNriktCeY1AAaE61qDQnWhACQ1ONCUAlgIAINSrJQCUAmISPJKJsL8xr7kpABNodhyQ9qwHNusjj/ANnVLUytlnln7n5WyZYyeuoJHoQrqWtMRtqRrt5qg4sFRPC8U0z432OTS13AaNuRpfbqsE9/034uv4XOF4VTwCzJZg0cnymT4vufioOHROmxDtSxvY0kZbHIDd0j5jbXoGNa4WN79pdcImNQxodI+ouN80rxZ41IsTuCu2fZhK9tAJaiRznVRc9ma2jGnKzYC98ub+QVuPHdkqfLVMrOO4HUteKr/pVcYivyErQTY/ua1hH/ALZVPLVNe2xFndf8LpGJzUtTGaacB7H7t2IINwQRq1wOoI1CxOM8D1MfeoZWTM/9OZ2SYeUjdHjzAPiVcMkTLJjf4ZOXB7nMdByO5J8PDmTyVz9mjbTzTAXZZsbT+rKSSR4XcosfDOJzvdHUMMMYAvYg5/7Q4OJK2mF4L91p8rfaaDbpexISyy1SKw46ds5lxgRmmjhH9WoLGaezaQvFvAZLeSRxJ2LHRwxvcAe+QTdgeBa4v1uVIwWjm/rThoYW52A+2Cdi4W00J96yGL1vazuI9lvdHodU27lSBR4xt9s2PDEvZTsf0eCu9U82ZocNQ4Aj1Xm/BpH3bk1dmFgdieQ1XX+F+MIwG09U11PK0WBfpG7Xk47euniiK/CZv9NsCUoOSGm+o1B6bIXVEDpSTH4JIKW2RFhQy+NMPYp51TT407JorXXTbip0kajSRp2BGcmXlPSNTD7piG8yCTmQTJGGJ9ijxlPsKwOgfYnmqO0p5pTAeCcamWlOgoAeBSgmmlLugBweaW1NApYKBDiJEHI7pgQq6MDvFVc9aXezbTmVoZ3ECyyXEbXuaWxgl7gcoDst7Ancmw5rm96OmPWzkHHtYHVEmUgtBt4ZrDNb1+S6F9n3E0dVSR01wyWmY1gZ1axoaJG9Qba9CfJcqx2jfE5zJGkEHfdv/cNCq7DqkwyMkBIMb2uuCQbA94adRcLZxuNGSnUrO/y05c6zrsdycNj/AJUymili3eCORF/iE5MQ1ti4Fp1aT/lU8+IuvYWsuU61s0lNioPddfTqn5Khp25rJtq77q1oH5lXJkOC7Oc/aRiTadhhZ/UeSB1DRoXLm1K3K0XAu4897LXfaVh5GIy5iSHBr2jfuuF9PC+YeizDqd7nWy26eS6YKonNN3I2XANGZqhpy9xhzE+WwHUk2XbH4RFNCI542v3OvtNLv0uGoPkucfZ9iLKZjYxE2+mZ+uY9V0+GvjcbA2PinGLWyZyT0HhlCyCJsMebIwENzG7rEk7+qk28Um6PVNkoMBKyJLVIazxQD0MWI5p2MX6opJA1IlqRluEwoKrcAFWSVN1CqsQc51rWCVG240CExSVMKaoKYjnuVK+4k76JxkLGdPNUSG2lugm3Yk0G10EAVbSn2JpsRPIo2OssjYlNKcYVGbKpEeuyApj7U4Cktp3dE4Kd3RVTJ5IAKW1K+7lNF1khpWPhC6Z7QJyE5jZANMcATkYubIqhgY0vcQAEmg9nMQbu19Dt8FMmOKQ7U7FYriKrs+3UEe9a+ulsFzXiqf8AEv0aT6nQKcauaKyOoMzeKUsZa4/lubcxppf339ywmI0xGoGh2HO3iujYlDlgAPS563O3++KwtNRveX5HDs238RpuR0XTJezni/RtuFeMJBSthma6QRjuuFi/KNgQbXsOe9lcwYhFKMzHA35bO9xUHhfAB2bb8wLo6/ADA4kD8N5v+13TyKwyY12joxZX9WW9Kbmy0+GWWXpMWhYzLI7vgXsA5zvcB6rVYOWuAc3UH/dlzOLWzp5p6MT9sOH/AIlLONCWyROPW2V7B/8AosNIQwBxt6rrn2l0zZKQEkZ4pWSNF7E6OY6w52a9x/iuU1bNBto4fNduLcTgyakXOD4pDoO0a129ibeW6vcOxwmVzcw7pDb9QNSspLTMBJIbawPuFz8keAOOVzzz+bt/hdaRVbM5O9HQaPiB7S5wNg4311AGw062stXgfELZbMfo87HYO/wVy6GXOR+kbDqequIHZACXAa/y8gszSjcYzioiPVS8MxIPaDa1+qhUNPHURtc45jbXz8VZwwsYLAAKUndm08kHBRS3+kPFmukFmg6oUtI4NsTb4qVNWsbzVfPiw5Aqq3ZlzfHiP/cWDU6opahjOgVLV4jI7nbyVZI8nckp0QXdTjI2aL+Kq56tztyomZHmTAVnQTaCANjM1oaVz3EeIMsjmi+hstZLirS0i4XN8TgzSuN9ysst+j0PgeO35C2bxF5q44bxjtJcqyENF4q4wWPspA7VYpSs9HLP47xtR7OsROFgnQ4LPwYsCAnzia67R88W1S8ZVgMTxtzZXNHJaSbEC4WWUrMEkkeXDmsctvo9D4E8cG/IEOIHK34excvksVRHhyUdVMoMLkiObXZYpTs9DLn+LLG0uzU1VX94kETfYYbu8bb/AOFbsVJw9Q9mwuIs55v6DYfX1VuXWCuUrZ5EVSIGKy6Fcor6t81e+IW7Jls2mugBOvmfgul4m9cy4XAklqKi39SV4BJvcBxGnT/wrwK5Nk5nUUhnjGoIGVvPbzOg+d/RNYLgbuxyNHtWzHz5KbPTfeKxkTdSHBo6Zje3uGYrqFLgsceWNg0bYkndzubiuh7Zzp0iDhOF9n3TyaPkp89I0gtcMwdpqrGsis4HTayQ9h8EAcLoqYuleXkNdnlLnOvdgjLr7a2s3bndSoeJHtOS7tRe4LhsBuQdrWHqtfxdwy+0skDA5sozPYLNe15Lcz2nmCG6jXdZXhrhiWWW8rC2MWuCfa8FDkodlKLn0DCaaaqlIY179dXa5QOd3nby3VXUUbo3uhcO9Ccjv4nl10XbcPo2xMDWANA5AWXN/tNoHQztqGgZZwGu3vnaLHTxbb4qYZeUqKni4xsy2LS2YRzLQP8AuNvonqMWYxo5kk+lgPmVRY5WFsgFtMrT7i5XuCNJY0uFjb3A6rVvRmlst4bjY2P+7KwpIgLl3TS6jQyNaOvjySXTOcbXsFmaGv4VrDeSx07o+auZZidyVmuFG2EluoV466aJYHlMvRuKQ4piGXpgsUgpBQBHdHZIBCXM9RiUAP8AaBBR7oIAsRhIQ/4CzoFa2TjAsiyBBgrOgUyPB2dApkbU4LoGRo8LaFLbRNQanmhAEf7o3ono4gE+1iUWJolsbyBQcVmYwNDrfiODfQnU/wC9UrFsSipo3SyuAA2F9XHkB4rC4niL5TmeRfoD7P8Ab6JgjorU3Uy2VZgGJiWJtyO0aLOFxfT83kU/UvXK9aOpbKzGZ8rHu/S1zvc0lc+w6VtNStuDfkLbvJ2Hjc/FbLiWdohkBPtNLfHvd36rm0VYKmsgiYbxxSgnoS27j7jYLo+P0zD5HaR0/grAQyRsjh3mgvceZe8WsPIFbWOPUn3KLhcIawdXaqZ710MwQzVG5QDdEHC3JGDcoEIkgBaR1BCr442gXsrZzQAqki1x0JXNnXTOnA+0Sm7LOceYV29K6wu+IiVvXu3Dx6tLvgryF6edqsYv2bSXo8yGIvqWNcbi2broCSB8lro3gCwBceg0HqUvivBWUVW7R+WUZoiALNZfVg8j8MqVQvjIFnWP9wsuq72ctUMSum3LQGjkOSmUVVe11Ytg0uSCFTO0cbdUDNvw8LZ+hsR6q3MgWe4ZnLmuHS31V0AmiWOveFHfKjemg1MQiSRMulKkuiumnwoAgSvSGSJ2ojKabGgBZkCCQYkExGwbZKCCCxNB5hTwcESCAFZktrwgggYoTIxJdBBUScwxfETUVTnOsWQk5WkAm17DU7XtfRQsodrc76g9UaCBjMuIOjcHRucHDQAaDpcn6K0i4slHdeA7x2PwQQQ4p9gpNdFHjeNPnD8jmtfEbWc0uZcgEEnyPoq/heiDasPbs4h1uh/Nbw0RIKoKnSJm29s7xSzd0eSkMfzKCC0IDdvojErRpqgggQyX3N+ig1Bs8+Nj9PojQWGf6m+H7DLnWT8ct0EFyI62ZnjaaJ/Zxubme05ttACCCL+46fpCwDqAOc4RmxYSMp2PkfofegguuH1OWf2JGHVDmkxuHdOnkeqTUR287oIKiDQ8Ij2/4/VaNxRoJoTG7pJQQTEEXJp8iCCAIspuo7nWQQTEJ7VBBBAH/9k=')
-        final_clip = video_clip.with_audio(audio_clip)
-        final_clip.write_videofile(final_video_file)																			
-
-        # Return the path of the final combined video
-        return final_video_file
     
-    # except subprocess.CalledProcessError as e:
-    #     logging.error(f"Error combining video and audio: {e.stderr}")
-    #     return None
-    except Exception as e:
-        logging.error(f"Unexpected error while combining video and audio: {e}")
-        return None
 
 # Main function to handle the full process
 @app.route('/generate-test-to-video', methods=['POST'])
 def generate_video_from_script():
+    data = request.json
+    script_text = data.get('script')
+    if not script_text:
+        return jsonify({'error': 'Missing script.'}), 400
+
+    return submit_job('generate-test-to-video', script_text=script_text)
+
+@job('generate-test-to-video', error_message='Failed to generate video')
+def generate_video_from_script_job(script_text):
+    # Narration (cached by text) and background go through a single ffmpeg run
+    final_video_file = render_script_video(script_text)
+    if not final_video_file:
+        raise JobError('Failed to create video from script.')
+
+    # If everything is successful, return the final video file path
+    return {
+        'message': 'Video successfully created.',
+        'final_video': final_video_file
+    }
+
+# Build the final text-to-video MP4 in one ffmpeg invocation: the cached still background loops
+# under the TTS audio for as many frames as the audio lasts, so there is no intermediate video file.
+# Both streams are copied.
+def render_script_video(script_text):
+    # Speech is synthesized sentence by sentence in parallel and cached per sentence
+    audio_file = generate_audio_from_script(script_text)
+    if not audio_file:
+        return None
+    final_video_file = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_final_video.mp4")
     try:
-        data = request.json
-        script_text = data.get('script')
-        # Step 1: Generate the audio from the script
-        audio_file = generate_audio_from_script(script_text)
-        if not audio_file or not os.path.exists(audio_file):
-            return jsonify({
-                'error': 'Audio file is missing or invalid.'
-            }), 400  # Return a 400 Bad Request status if the audio file is missing or invalid
-
-        # Step 2: Create a video from the audio
-        video_file = create_video_from_audio(audio_file)
-        if not video_file:
-            return jsonify({
-                'error': 'Failed to create video from audio.'
-            }), 500  # Return a 500 Internal Server Error if video creation fails
-
-        # Step 3: Combine the video and audio into the final video
-        final_video_file = combine_audio_and_video(video_file, audio_file)
-        if not final_video_file:
-            return jsonify({
-                'error': 'Failed to combine video and audio.'
-            }), 500  # Return a 500 Internal Server Error if combining video and audio fails
-
-        # os.remove(audio_file)
-        # os.remove(video_file)
-        
-        # If everything is successful, return the final video file path
-        return jsonify({
-            'message': 'Video successfully created.',
-            'final_video': final_video_file
-        }), 200  # Return a 200 OK status with the final video file path
-
-        
-        # # Step 2: Create a video from the audio
-        # video_file = create_video_from_audio(audio_file)
-        # if not video_file:
-        #     return jsonify(None)
-        
-        # # Step 3: Combine the video and audio into a final video
-        # final_video_file = combine_audio_and_video(video_file, audio_file)
-        # if not final_video_file:
-        #     return jsonify(None)
-        
-        # Cleanup: Remove temporary files
-        os.remove(audio_file)
-        os.remove(video_file)
-        
-        # return jsonify(final_video_file)
+        audio_info = probe(audio_file)
+        if audio_info.audio_codec not in MP4_AUDIO_CODECS:
+            # MP4 can't carry it (pyttsx3 writes PCM WAV). Encoding only the audio first keeps the mux a
+            # pure stream copy; cuts overshoot by minutes when one stream is copied and one encoded.
+            aac_file = f"{os.path.splitext(audio_file)[0]}.m4a"
+            subprocess.run([
+                'ffmpeg', '-y', '-loglevel', 'error', '-i', audio_file, '-c:a', 'aac', '-b:a', '192k', aac_file
+            ], check=True)
+            os.remove(audio_file)
+            audio_file = aac_file
+        command = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-stream_loop', '-1', '-i', get_background_clip('black', '1280x720'),
+            '-i', audio_file,
+            '-map', '0:v:0', '-map', '1:a:0',
+            '-c:v', 'copy', '-c:a', 'copy',
+            # Not -shortest or -t: copied cuts of the background land whole frames before or after the
+            # audio end. Counting frames makes the video end within one frame after the audio.
+            '-frames:v', str(math.ceil(audio_info.duration * BACKGROUND_FPS) + 1),
+            final_video_file
+        ]
+        subprocess.run(command, check=True)
+        return final_video_file
     except Exception as e:
-        logging.error(f"Error generating video: {e}")
+        logging.error(f"Error rendering video from script: {e}")
+        if os.path.exists(final_video_file):
+            os.remove(final_video_file)
         return None
+    finally:
+        if os.path.exists(audio_file):
+            os.remove(audio_file)
     
     
 if __name__ == '__main__':
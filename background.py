@@ -0,0 +1,38 @@
+# background.py
+import os
+import uuid
+import logging
+import threading
+import subprocess
+
+# Configuration
+UPLOAD_FOLDER = 'uploads'
+BACKGROUND_CACHE_DIR = os.getenv('BACKGROUND_CACHE_DIR', os.path.join(UPLOAD_FOLDER, 'backgrounds'))
+BACKGROUND_FPS = int(os.getenv('BACKGROUND_FPS', 25))  # Rendered videos end within one frame after their audio
+BACKGROUND_CLIP_SECONDS = int(os.getenv('BACKGROUND_CLIP_SECONDS', 60))  # Length of the cached clip that gets looped
+
+_background_lock = threading.Lock()
+
+
+# Path of the cached pre-encoded clip for a background, encoding it the first time it is needed.
+# The clip is a single GOP at BACKGROUND_FPS tuned for still images, so it is tiny and cheap to make.
+def get_background_clip(color='black', size='1280x720', fps=BACKGROUND_FPS, seconds=BACKGROUND_CLIP_SECONDS):
+    os.makedirs(BACKGROUND_CACHE_DIR, exist_ok=True)
+    clip = os.path.join(BACKGROUND_CACHE_DIR, f"{color}_{size}_{fps}fps_{seconds}s.mp4")
+    if os.path.exists(clip):
+        return clip
+    with _background_lock:
+        if not os.path.exists(clip):
+            partial = os.path.join(BACKGROUND_CACHE_DIR, f"{uuid.uuid4().hex}.partial.mp4")
+            subprocess.run([
+                'ffmpeg', '-y', '-loglevel', 'error',
+                '-f', 'lavfi', '-i', f'color=c={color}:s={size}:r={fps}',
+                '-t', str(seconds),
+                '-c:v', 'libx264', '-tune', 'stillimage', '-crf', '30', '-pix_fmt', 'yuv420p',
+                '-g', str(fps * seconds), '-an',
+                partial
+            ], check=True)
+            os.replace(partial, clip)
+            logging.info(f"Encoded background clip {clip}")
+    return clip
+
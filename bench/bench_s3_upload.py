@@ -0,0 +1,86 @@
+# bench/bench_s3_upload.py
+# Per-upload overhead of a fresh boto3 client per call (the old upload_to_s3) against the shared,
+# pooled client in helpers, using a local moto S3 server as the stand-in bucket.
+#
+#   pip install "moto[server]"
+#   python bench/bench_s3_upload.py --uploads 200 --size 65536
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import boto3
+from moto.server import ThreadedMotoServer
+
+BUCKET = 'bench-bucket'
+
+
+def configure(port):
+    os.environ.update({
+        'AWS_S3_BUCKET': BUCKET,
+        'AWS_S3_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY': 'bench',
+        'AWS_SECRET_KEY': 'bench',
+        'AWS_ENDPOINT_URL': f'http://127.0.0.1:{port}',
+    })
+
+
+# upload_to_s3 as it was: a new client (and botocore session, and connection) for every file
+def fresh_client_upload(file_path, file_name):
+    s3_client = boto3.client('s3',
+                             region_name=os.getenv('AWS_S3_REGION'),
+                             aws_access_key_id=os.getenv('AWS_ACCESS_KEY'),
+                             aws_secret_access_key=os.getenv('AWS_SECRET_KEY'))
+    s3_client.upload_file(file_path, os.getenv('AWS_S3_BUCKET'), file_name)
+    return f"https://{os.getenv('AWS_S3_BUCKET')}.s3.{os.getenv('AWS_S3_REGION')}.amazonaws.com/{file_name}"
+
+
+def per_upload_ms(upload, file_path, uploads, prefix):
+    started = time.perf_counter()
+    for index in range(uploads):
+        if not upload(file_path, f"{prefix}/{index}.mp4"):
+            raise RuntimeError("Upload failed")
+    return 1000 * (time.perf_counter() - started) / uploads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-upload overhead, fresh vs shared S3 client")
+    parser.add_argument('--uploads', type=int, default=200)
+    parser.add_argument('--size', type=int, default=64 * 1024, help="Bytes per uploaded file")
+    parser.add_argument('--port', type=int, default=5123)
+    args = parser.parse_args()
+
+    configure(args.port)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=args.port, verbose=False)
+    server.start()
+    workdir = tempfile.mkdtemp(prefix='bench_s3_')
+    try:
+        boto3.client('s3', region_name='us-east-1', aws_access_key_id='bench',
+                     aws_secret_access_key='bench').create_bucket(Bucket=BUCKET)
+        file_path = os.path.join(workdir, 'segment.mp4')
+        with open(file_path, 'wb') as f:
+            f.write(os.urandom(args.size))
+
+        from helpers import upload_to_s3
+
+        before = per_upload_ms(fresh_client_upload, file_path, args.uploads, 'fresh')
+        upload_to_s3(file_path, 'warmup.mp4')  # Builds the shared client once, like the first upload of a process
+        after = per_upload_ms(lambda path, key: upload_to_s3(path, key, dedup=False), file_path, args.uploads, 'shared')
+
+        print(f"{args.uploads} uploads of {args.size} bytes")
+        print(f"fresh client per upload: {before:.2f} ms/upload")
+        print(f"shared pooled client:    {after:.2f} ms/upload")
+        print(f"overhead saved:          {before - after:.2f} ms/upload ({before / after:.1f}x)")
+    finally:
+        shutil.rmtree(workdir)
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
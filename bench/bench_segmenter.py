@@ -0,0 +1,84 @@
+# bench/bench_segmenter.py
+# Compare the old per-segment ffmpeg loop of /process-video with the single-pass segment muxer
+# (segmenter.segment_video) on a synthetic lavfi-generated file.
+#
+#   python bench/bench_segmenter.py --minutes 30 --segment-length 10
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segmenter import segment_video
+
+
+def make_source(path, minutes, size):
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=s={size}:r=30',
+        '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=44100',
+        '-t', str(minutes * 60),
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '60',
+        '-c:a', 'aac', '-shortest',
+        path
+    ], check=True)
+
+
+# The loop /process-video ran before: one ffmpeg per segment, each reopening the source
+def per_segment_loop(video_file, duration, segment_length, output_dir):
+    count = 0
+    for start_time in range(0, int(duration), int(segment_length)):
+        end_time = min(start_time + int(segment_length), duration)
+        segment_file = os.path.join(output_dir, f"loop_{count:05d}.mp4")
+        subprocess.run([
+            'ffmpeg', '-y', '-loglevel', 'error', '-i', video_file,
+            '-ss', str(start_time), '-to', str(end_time), '-c', 'copy', segment_file
+        ], check=True)
+        os.remove(segment_file)
+        count += 1
+    return count
+
+
+def segment_muxer(video_file, segment_length, output_dir):
+    count = 0
+    for segment_file in segment_video(video_file, segment_length, output_dir):
+        os.remove(segment_file)
+        count += 1
+    return count
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    count = fn(*args)
+    return count, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-segment ffmpeg loop vs. the single-pass segment muxer")
+    parser.add_argument('--minutes', type=float, default=30)
+    parser.add_argument('--segment-length', type=int, default=10)
+    parser.add_argument('--size', default='640x360')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_segmenter_')
+    try:
+        source = os.path.join(workdir, 'source.mp4')
+        print(f"Generating {args.minutes:g} min {args.size} source...")
+        make_source(source, args.minutes, args.size)
+
+        loop_count, loop_seconds = timed(per_segment_loop, source, args.minutes * 60, args.segment_length, workdir)
+        muxer_count, muxer_seconds = timed(segment_muxer, source, args.segment_length, workdir)
+
+        print(f"per-segment loop: {loop_count} segments in {loop_seconds:.2f}s")
+        print(f"segment muxer:    {muxer_count} segments in {muxer_seconds:.2f}s")
+        print(f"speedup:          {loop_seconds / muxer_seconds:.1f}x")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# bench/bench_text_to_video.py
+# CPU seconds and peak RSS of the /generate-test-to-video render, before (black 1280x720 libx264
+# encode of the whole duration, then a moviepy decode/re-encode to add the audio) and after
+# (render_script_video: cached still clip looped under the audio with stream copy).
+# Each variant runs in its own child process so its rusage and peak RSS are its own.
+#
+#   python bench/bench_text_to_video.py --minutes 10
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_narration(path, minutes):
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', 'sine=frequency=220:sample_rate=24000',
+        '-t', str(minutes * 60), '-c:a', 'libmp3lame', '-b:a', '64k',
+        path
+    ], check=True)
+
+
+# The pipeline as it was: create_video_from_audio followed by combine_audio_and_video
+def setup_before():
+    from moviepy import VideoFileClip, AudioFileClip
+    from media_probe import probe
+
+    def render(audio_file):
+        video_file = 'uploads/before_video.mp4'
+        subprocess.run([
+            'ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi', '-t', str(probe(audio_file).audio_duration),
+            '-i', 'color=c=black:s=1280x720', '-vcodec', 'libx264', '-an', video_file
+        ], check=True)
+        video_clip = VideoFileClip(video_file)
+        audio_clip = AudioFileClip(audio_file)
+        video_clip.with_audio(audio_clip).write_videofile('uploads/before_final.mp4', logger=None)
+        return 'uploads/before_final.mp4'
+    return render
+
+
+def setup_after():
+    import app
+
+    def render(audio_file):
+        # render_script_video removes its audio afterwards, so hand it a copy
+        app.generate_audio_from_script = lambda script_text: shutil.copyfile(audio_file, 'uploads/narration_copy.mp3')
+        return app.render_script_video("benchmark")
+    return render
+
+
+def cpu_seconds():
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+# Child process: run one variant in workdir and print its measurements as JSON
+def run_variant(variant, workdir, audio_file):
+    os.chdir(workdir)
+    os.makedirs('uploads', exist_ok=True)
+    # Imports and one-off setup are not part of a request
+    render = setup_before() if variant == 'before' else setup_after()
+    cpu_started, started = cpu_seconds(), time.perf_counter()
+    output = render(audio_file)
+    wall = time.perf_counter() - started
+    cpu = cpu_seconds() - cpu_started
+    # ru_maxrss is in KiB on Linux and covers the whole child. The children figure is the largest ffmpeg,
+    # but never below the Python process it was forked from.
+    peak_self = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    peak_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(json.dumps({'wall': wall, 'cpu': cpu, 'rss_python': peak_self, 'rss_ffmpeg': peak_children,
+                      'size': os.path.getsize(output)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU and peak RSS of the text-to-video render, before and after")
+    parser.add_argument('--minutes', type=float, default=10, help="Narration length")
+    parser.add_argument('--variant', choices=['before', 'after'], help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--audio', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.workdir, args.audio)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bench_text_to_video_')
+    try:
+        audio_file = os.path.join(workdir, 'narration.mp3')
+        print(f"Generating {args.minutes:g} min narration...")
+        make_narration(audio_file, args.minutes)
+        # The still clip is encoded once per deployment, not per request, so it is made up front
+        subprocess.run([sys.executable, '-c', "from background import get_background_clip; "
+                        "get_background_clip('black', '1280x720')"],
+                       check=True, cwd=workdir, env=dict(os.environ, PYTHONPATH=ROOT))
+
+        results = {}
+        for variant in ('before', 'after'):
+            child = subprocess.run([sys.executable, os.path.abspath(__file__), '--variant', variant,
+                                    '--workdir', workdir, '--audio', audio_file],
+                                   check=True, stdout=subprocess.PIPE, text=True)
+            results[variant] = json.loads(child.stdout.strip().splitlines()[-1])
+
+        print(f"{'':8} {'wall s':>8} {'CPU s':>8} {'peak RSS python':>16} {'peak RSS ffmpeg':>16} {'output':>10}")
+        for variant, result in results.items():
+            print(f"{variant:8} {result['wall']:8.2f} {result['cpu']:8.2f} {result['rss_python']:13.1f} MiB"
+                  f" {result['rss_ffmpeg']:13.1f} MiB {result['size'] / 1024 ** 2:7.1f} MiB")
+        print(f"CPU saved: {results['before']['cpu'] / max(results['after']['cpu'], 1e-3):.0f}x")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
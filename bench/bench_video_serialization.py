@@ -0,0 +1,133 @@
+# bench/bench_video_serialization.py
+# Memory and time for 100k video records: the old plain Video class (per-instance __dict__) with
+# json.dumps against the __slots__ Video with models.dumps (orjson when installed), and the old
+# get_all_videos dict-per-document copy against serializing the driver's documents as they are, the
+# way /list-videos does.
+#
+#   python bench/bench_video_serialization.py --videos 100000
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+import models
+
+
+# models.Video as it was
+class OldVideo:
+    def __init__(self, video_url, segment_length, file_urls, processed_video_url=None, segments=None, script=None, status="processing"):
+        self.video_url = video_url
+        self.segment_length = segment_length
+        self.file_urls = file_urls
+        self.processed_video_url = processed_video_url
+        self.segments = segments if segments else []
+        self.script = script
+        self.video_length = segment_length
+        self.status = status
+        self.created_at = datetime.utcnow()
+
+    def to_dict(self):
+        return {
+            'video_url': self.video_url,
+            'segment_length': self.segment_length,
+            'file_urls': json.loads(self.file_urls) if isinstance(self.file_urls, str) else self.file_urls,
+            'processed_video_url': self.processed_video_url,
+            'segments': self.segments,
+            'script': self.script,
+            'video_length': self.video_length,
+            'status': self.status,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+
+# get_all_videos as it was: a new dict per document before serializing
+def old_copy_documents(documents):
+    return [{
+        'video_url': video['video_url'],
+        'segment_length': video['segment_length'],
+        'file_urls': video['file_urls'],
+        'processed_video_url': video.get('processed_video_url'),
+        'segments': video.get('segments'),
+        'script': video.get('script'),
+        'video_length': video['video_length'],
+        'status': video['status'],
+        'created_at': video['created_at']
+    } for video in documents]
+
+
+def file_urls(index):
+    return [f"https://bucket.s3.amazonaws.com/{index}_segment_{segment:05d}.mp4" for segment in range(6)]
+
+
+def make_videos(video_class, urls):
+    return [video_class(video_url, 10, segment_urls) for video_url, segment_urls in urls]
+
+
+def make_documents(count):
+    created_at = datetime.utcnow().strftime(models.CREATED_AT_FORMAT)
+    return [{'_id': ObjectId(), 'video_url': f"https://example.com/{index}.mp4", 'segment_length': 10,
+             'file_urls': file_urls(index), 'processed_video_url': None, 'segments': [], 'script': None,
+             'video_length': 10, 'status': 'processing', 'created_at': created_at}
+            for index in range(count)]
+
+
+# (result, seconds, peak bytes allocated while running fn). Timed and traced in separate runs, since
+# tracemalloc slows allocation-heavy code down several times over.
+def measure(fn, *args):
+    gc.collect()
+    started = time.perf_counter()
+    fn(*args)
+    seconds = time.perf_counter() - started
+    gc.collect()
+    tracemalloc.start()
+    result = fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def report(label, seconds, peak):
+    print(f"  {label:28} {seconds * 1000:9.1f} ms {peak / 1024 ** 2:9.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Video record memory and serialization, before and after")
+    parser.add_argument('--videos', type=int, default=100_000)
+    args = parser.parse_args()
+    print(f"{args.videos} videos; serializer: {'orjson' if models.orjson else 'json'}")
+
+    # The URL strings are shared by both variants, so only the records themselves are measured
+    urls = [(f"https://example.com/{index}.mp4", json.dumps(file_urls(index))) for index in range(args.videos)]
+
+    print("Holding the records")
+    old_videos, seconds, peak = measure(make_videos, OldVideo, urls)
+    report("plain class", seconds, peak)
+    new_videos, seconds, peak = measure(make_videos, models.Video, urls)
+    report("__slots__", seconds, peak)
+
+    print("Serializing the records")
+    old_json, seconds, peak = measure(lambda: json.dumps([video.to_dict() for video in old_videos]).encode('utf-8'))
+    report("to_dict + json.dumps", seconds, peak)
+    new_json, seconds, peak = measure(lambda: models.dumps([video.to_dict() for video in new_videos]))
+    report("to_dict + models.dumps", seconds, peak)
+
+    print("Serializing stored documents (listing)")
+    documents = make_documents(args.videos)
+    _, seconds, peak = measure(lambda: json.dumps(old_copy_documents(documents), default=str).encode('utf-8'))
+    report("copy per document + json", seconds, peak)
+    _, seconds, peak = measure(models.dumps, documents)
+    report("documents + models.dumps", seconds, peak)
+
+    assert json.loads(old_json)[0]['file_urls'] == json.loads(new_json)[0]['file_urls']
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+# download_cache.py
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Configuration
+UPLOAD_FOLDER = 'uploads'
+DOWNLOAD_CACHE_DIR = os.getenv('DOWNLOAD_CACHE_DIR', os.path.join(UPLOAD_FOLDER, 'download_cache'))
+DOWNLOAD_CACHE_MAX_BYTES = int(os.getenv('DOWNLOAD_CACHE_MAX_BYTES', 10 * 1024 ** 3))
+DOWNLOAD_CACHE_TTL = int(os.getenv('DOWNLOAD_CACHE_TTL', 24 * 60 * 60))  # seconds
+
+# Query parameters that only track where a link was shared from and never change the video
+_TRACKING_PARAMS = {'fbclid', 'igshid', 'igsh', 'si', 'feature', 'ref', 'ref_src', 'mibextid'}
+
+
+# Normalize a URL so trivially different links to the same video share a cache entry
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if key.lower() not in _TRACKING_PARAMS and not key.lower().startswith('utm_')]
+    host = parts.netloc.lower()
+    if host.startswith('www.') or host.startswith('m.'):
+        host = host.split('.', 1)[1]
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower() or 'https', host, path, urlencode(sorted(query)), ''))
+
+
+# Cache key from the extractor's own id when known (stable across URL variants), else the normalized URL
+def cache_key(url, extractor=None, video_id=None):
+    if extractor and video_id:
+        source = f"{extractor.lower()}:{video_id}"
+    else:
+        source = normalize_url(url)
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+class DownloadCache:
+    """Size-bounded LRU cache of files on local disk (downloaded videos, synthesized audio), with a TTL per entry."""
+
+    def __init__(self, directory=DOWNLOAD_CACHE_DIR, max_bytes=DOWNLOAD_CACHE_MAX_BYTES, ttl=DOWNLOAD_CACHE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (path, size, stored_at), least recently used first
+        self._aliases = {}  # normalized URL -> key, so repeat URLs skip the extractor lookup
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    # Rebuild the index from files left by a previous process, oldest access first. put() and get() stamp
+    # each file explicitly (mtime = stored at, atime = last used) because neither can be trusted otherwise:
+    # yt-dlp sets mtime from Last-Modified and relatime/noatime mounts don't keep atime current.
+    def _load(self):
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.partial') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_atime, os.path.splitext(name)[0], path, stat.st_size, stat.st_mtime))
+        for _, key, path, size, stored_at in sorted(files):
+            self._entries[key] = (path, size, stored_at)
+            self._total_bytes += size
+        self._evict()
+
+    def _remove(self, key):
+        path, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+        for alias in [alias for alias, aliased_key in self._aliases.items() if aliased_key == key]:
+            del self._aliases[alias]
+        try:
+            os.remove(path)
+        except OSError as e:
+            logging.warning(f"Could not remove cached download {path}: {e}")
+
+    def _touch(self, path, used_at, stored_at):
+        try:
+            os.utime(path, (used_at, stored_at))
+        except OSError as e:
+            logging.warning(f"Could not stamp cached file {path}: {e}")
+
+    def _evict(self):
+        while self._entries and self._total_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def key_for_url(self, url):
+        with self._lock:
+            return self._aliases.get(normalize_url(url))
+
+    # Whether key has a live entry; unlike get() this neither counts as a lookup nor touches the LRU order
+    def contains(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return bool(entry) and time.time() - entry[2] <= self.ttl and os.path.exists(entry[0])
+
+    # Return the cached file for key (marking it recently used), or None on a miss or expired entry
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    # get() with the lock held. count_miss=False leaves a miss out of the stats, for lookups that are
+    # retried under another key (a URL alias whose entry has gone).
+    def _get(self, key, count_miss=True):
+        entry = self._entries.get(key)
+        if entry and time.time() - entry[2] > self.ttl:
+            self._remove(key)
+            entry = None
+        if not entry or not os.path.exists(entry[0]):
+            if entry:
+                self._remove(key)
+            if count_miss:
+                self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self._touch(entry[0], time.time(), entry[2])
+        return entry[0]
+
+    # Copy a finished file into the cache under key and remember url as an alias for it
+    def put(self, key, file_path, url=None):
+        extension = os.path.splitext(file_path)[1]
+        cached_path = os.path.join(self.directory, f"{key}{extension}")
+        partial_path = f"{cached_path}.partial"
+        link_or_copy(file_path, partial_path)
+        os.replace(partial_path, cached_path)
+        size = os.path.getsize(cached_path)
+        stored_at = time.time()
+        self._touch(cached_path, stored_at, stored_at)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (cached_path, size, stored_at)
+            self._total_bytes += size
+            if url:
+                self._aliases[normalize_url(url)] = key
+            self._evict()
+        return cached_path
+
+    # Place the cached file for key at output_path. Returns False on a miss.
+    # The entry is pinned with a hardlink taken under the lock, so an eviction in the meantime cannot
+    # remove the file halfway through a copy to another filesystem.
+    def fetch(self, key, output_path, url=None, count_miss=True):
+        with self._lock:
+            cached_path = self._get(key, count_miss)
+            if not cached_path:
+                return False
+            pinned_path = f"{cached_path}.{uuid.uuid4().hex}.partial"
+            link_or_copy(cached_path, pinned_path)
+            if url:
+                self._aliases[normalize_url(url)] = key
+        try:
+            link_or_copy(pinned_path, output_path)
+        finally:
+            os.remove(pinned_path)
+        logging.info(f"Cache hit for {url or key} in {self.directory}")
+        return True
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+            }
+
+
+# Hardlink when source and destination share a filesystem (no bytes copied), copy otherwise
+def link_or_copy(source, destination):
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+_download_cache = None
+_download_cache_lock = threading.Lock()
+
+# Process-wide cache, or None when disabled with DOWNLOAD_CACHE_ENABLED=false
+def get_download_cache():
+    global _download_cache
+    if os.getenv('DOWNLOAD_CACHE_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    if _download_cache is None:
+        with _download_cache_lock:
+            if _download_cache is None:
+                _download_cache = DownloadCache()
+    return _download_cache
@@ -2,13 +2,31 @@
 import os
 import subprocess
 import uuid
+import time
+import hashlib
+import random
+import threading
+import contextvars
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+import requests
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import S3Transfer, TransferConfig
+from botocore.config import Config
+from botocore.exceptions import (ClientError, ConnectionClosedError, ConnectTimeoutError,
+                                 EndpointConnectionError, ReadTimeoutError)
 import yt_dlp as youtube_dl
-from gtts import gTTS
-import pyttsx3
-import ffmpeg
 import logging
 
+from download_cache import get_download_cache, cache_key, normalize_url, link_or_copy
+from singleflight import SingleFlight
+from memory_cache import MemoryCache
+from media_probe import probe, ProbeError
+from transcoder import transcode_segments
+from tts import get_tts_backend, synthesize_speech
+import progress
+
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 AWS_S3_BUCKET = os.getenv('AWS_S3_BUCKET')
@@ -16,47 +34,322 @@ AWS_S3_REGION = os.getenv('AWS_S3_REGION')
 AWS_ACCESS_KEY = os.getenv('AWS_ACCESS_KEY')
 AWS_SECRET_KEY = os.getenv('AWS_SECRET_KEY')
 
+# Shared S3 client and transfer manager. boto3 clients are thread-safe, so one client (and its
+# connection pool) plus one S3Transfer (and its worker threads) are built lazily on first use and
+# reused by every upload in the process. max_concurrency therefore caps parts in flight process-wide.
+_s3_client = None
+_s3_transfer = None
+_s3_client_lock = threading.Lock()
+
+def get_s3_client():
+    global _s3_client, _s3_transfer
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                client = boto3.client('s3',
+                                      region_name=os.getenv('AWS_S3_REGION'),
+                                      aws_access_key_id=os.getenv('AWS_ACCESS_KEY'),
+                                      aws_secret_access_key=os.getenv('AWS_SECRET_KEY'),
+                                      config=Config(max_pool_connections=int(os.getenv('S3_MAX_POOL_CONNECTIONS', 50))))
+                transfer_config = TransferConfig(
+                    multipart_threshold=int(os.getenv('S3_MULTIPART_THRESHOLD', 16 * 1024 * 1024)),
+                    multipart_chunksize=int(os.getenv('S3_MULTIPART_CHUNKSIZE', 16 * 1024 * 1024)),
+                    max_concurrency=int(os.getenv('S3_MAX_CONCURRENCY', 20))
+                )
+                _s3_transfer = S3Transfer(client, transfer_config)
+                _s3_client = client
+    return _s3_client
+
+def get_s3_transfer():
+    get_s3_client()
+    return _s3_transfer
+
+# Public URL of an object in the configured bucket
+def s3_object_url(file_name):
+    return f"https://{os.getenv('AWS_S3_BUCKET')}.s3.{os.getenv('AWS_S3_REGION')}.amazonaws.com/{file_name}"
+
+# Errors worth retrying: throttling, 5xx responses and dropped connections
+S3_RETRY_ATTEMPTS = int(os.getenv('S3_RETRY_ATTEMPTS', 4))
+S3_RETRY_BASE_DELAY = float(os.getenv('S3_RETRY_BASE_DELAY', 0.5))
+_TRANSIENT_S3_ERROR_CODES = {'500', '502', '503', '504', 'InternalError', 'RequestTimeout',
+                             'ServiceUnavailable', 'SlowDown', 'Throttling', 'ThrottlingException'}
+
+def _is_transient_s3_error(error):
+    if isinstance(error, S3UploadFailedError):
+        # S3Transfer wraps the underlying ClientError; judge by that one
+        error = error.__cause__ or error.__context__
+    if isinstance(error, (EndpointConnectionError, ConnectionClosedError, ReadTimeoutError, ConnectTimeoutError)):
+        return True
+    if isinstance(error, ClientError):
+        return str(error.response.get('Error', {}).get('Code')) in _TRANSIENT_S3_ERROR_CODES
+    return False
+
+# S3 transfer callback reporting bytes sent for the current job. The callback runs on the transfer
+# manager's threads, so the job id is captured here in the caller's thread.
+def _upload_progress_callback(file_path, file_name):
+    job_id = progress.current_job_id.get()
+    if job_id is None:
+        return None
+    total_bytes = os.path.getsize(file_path)
+    sent = [0]
+    sent_lock = threading.Lock()
+
+    def callback(bytes_amount):
+        with sent_lock:
+            sent[0] += bytes_amount
+            bytes_sent = sent[0]
+        progress.hub.publish(job_id, 'progress', {
+            'stage': 'upload', 'key': file_name, 'bytes': bytes_sent, 'totalBytes': total_bytes
+        }, throttle_key=None if bytes_sent >= total_bytes else f"upload:{file_name}")
+    return callback
+
+# Upload one file, retrying transient errors with jittered exponential backoff. Raises on failure.
+def _upload_file_with_retry(file_path, file_name, attempts=S3_RETRY_ATTEMPTS, base_delay=S3_RETRY_BASE_DELAY):
+    for attempt in range(attempts):
+        try:
+            get_s3_transfer().upload_file(file_path, os.getenv('AWS_S3_BUCKET'), file_name,
+                                          callback=_upload_progress_callback(file_path, file_name))
+            return s3_object_url(file_name)
+        except Exception as e:
+            if attempt == attempts - 1 or not _is_transient_s3_error(e):
+                raise
+            delay = random.uniform(0, base_delay * (2 ** attempt))
+            logging.warning(f"Transient S3 error uploading {file_name} (attempt {attempt + 1}/{attempts}), retrying in {delay:.2f}s: {e}")
+            time.sleep(delay)
+
+# Content-addressed uploads: digest -> object URL for what this process recently saw in S3. Older
+# digests fall back to a HEAD request on the content key.
+_uploaded_digests = MemoryCache(max_entries=4096, ttl=24 * 60 * 60)
+
+def _dedup_enabled(dedup):
+    if dedup is None:
+        return os.getenv('S3_DEDUP_UPLOADS', 'false').lower() in ('1', 'true', 'yes')
+    return dedup
+
+# SHA-256 of a file, read in chunks so large videos are never held in memory
+def file_digest(file_path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _s3_object_exists(file_name):
+    try:
+        get_s3_client().head_object(Bucket=os.getenv('AWS_S3_BUCKET'), Key=file_name)
+        return True
+    except ClientError as e:
+        if str(e.response.get('Error', {}).get('Code')) in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+# Upload under a key derived from the file content; identical files are stored (and sent) only once
+def _upload_deduplicated(file_path, file_name):
+    digest = file_digest(file_path)
+    cached_url = _uploaded_digests.get(digest)
+    if cached_url:
+        logging.info(f"Skipping upload of {file_path}, identical content already at {cached_url}")
+        return cached_url
+
+    content_key = f"{digest}{os.path.splitext(file_name)[1]}"
+    if _s3_object_exists(content_key):
+        logging.info(f"Skipping upload of {file_path}, object {content_key} already exists")
+        file_url = s3_object_url(content_key)
+    else:
+        file_url = _upload_file_with_retry(file_path, content_key)
+    _uploaded_digests.put(digest, file_url)
+    return file_url
+
 # AWS S3 upload helper function
-def upload_to_s3(file_path, file_name):
+# With dedup (default from S3_DEDUP_UPLOADS) the object key is the content hash and file_name only supplies the extension.
+def upload_to_s3(file_path, file_name, dedup=None):
     try:
-        s3_client = boto3.client('s3',
-                                 region_name=os.getenv('AWS_S3_REGION'),
-                                 aws_access_key_id=os.getenv('AWS_ACCESS_KEY'),
-                                 aws_secret_access_key=os.getenv('AWS_SECRET_KEY'))
-        s3_client.upload_file(file_path, os.getenv('AWS_S3_BUCKET'), file_name)
-        file_url = f"https://{os.getenv('AWS_S3_BUCKET')}.s3.{os.getenv('AWS_S3_REGION')}.amazonaws.com/{file_name}"
-        return file_url
+        if _dedup_enabled(dedup):
+            return _upload_deduplicated(file_path, file_name)
+        return _upload_file_with_retry(file_path, file_name)
     except Exception as e:
         logging.error(f"Error uploading to S3: {e}")
         return None
 
-# Download a video from a URL (social media support via yt-dlp)
-def download_social_video(video_url, output_path):
+# Result of one upload in upload_many: url is set on success, error holds the exception otherwise
+UploadResult = namedtuple('UploadResult', ['path', 'key', 'url', 'error'])
+
+# Upload many files concurrently through the shared client. Results come back in input order.
+def upload_many(paths, keys=None, max_workers=8, dedup=None):
+    paths = list(paths)
+    keys = list(keys) if keys is not None else [os.path.basename(path) for path in paths]
+    if len(keys) != len(paths):
+        raise ValueError("upload_many needs one key per path.")
+
+    dedup = _dedup_enabled(dedup)
+
+    def upload(path, key):
+        try:
+            url = _upload_deduplicated(path, key) if dedup else _upload_file_with_retry(path, key)
+            return UploadResult(path, key, url, None)
+        except Exception as e:
+            logging.error(f"Error uploading {path} to S3: {e}")
+            return UploadResult(path, key, None, e)
+
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+        # Each upload runs in a copy of the caller's context so progress still reaches the caller's job
+        futures = [executor.submit(contextvars.copy_context().run, upload, path, key) for path, key in zip(paths, keys)]
+        return [future.result() for future in futures]
+
+# Stream an HTTP(S) resource straight into a multipart S3 upload without touching local disk.
+# For a non-seekable body boto3 buffers at most S3_STREAM_BUFFER_CHUNKS parts of S3_MULTIPART_CHUNKSIZE bytes.
+def stream_url_to_s3(source_url, file_name, headers=None):
+    stream_config = TransferConfig(
+        multipart_threshold=int(os.getenv('S3_MULTIPART_THRESHOLD', 16 * 1024 * 1024)),
+        multipart_chunksize=int(os.getenv('S3_MULTIPART_CHUNKSIZE', 16 * 1024 * 1024)),
+        max_concurrency=int(os.getenv('S3_STREAM_CONCURRENCY', 4)),
+        max_in_memory_upload_chunks=int(os.getenv('S3_STREAM_BUFFER_CHUNKS', 4))
+    )
+    with requests.get(source_url, headers=headers, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        get_s3_client().upload_fileobj(response.raw, os.getenv('AWS_S3_BUCKET'), file_name, Config=stream_config)
+    return s3_object_url(file_name)
+
+# Resolve the format the disk path would download ('bestvideo+bestaudio/best') and return its info
+# when that is a single file served over plain HTTP(S), so streaming it uploads exactly the same video.
+# Returns None when yt-dlp would merge separate streams or the protocol can't be streamed.
+def resolve_streamable_format(video_url):
+    ydl_opts = {
+        'format': 'bestvideo+bestaudio/best',
+        'quiet': True
+    }
+    try:
+        with youtube_dl.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(video_url, download=False)
+    except youtube_dl.utils.DownloadError as e:
+        logging.info(f"Could not resolve a format to stream for {video_url}: {e}")
+        return None
+    if info.get('requested_formats') or info.get('protocol') not in ('http', 'https') or not info.get('url'):
+        return None
+    return info
+
+# Objects recently streamed into S3 by this process: normalized URL or download cache key -> S3 URL
+_streamed_objects = MemoryCache(max_entries=1024, ttl=24 * 60 * 60)
+
+# Stream a social video directly into S3. Returns the S3 URL, or None if the caller must use the disk
+# path: the format needs merging, or the video is in the download cache and is served from there.
+# A video this process has streamed before is not fetched again.
+def stream_social_video_to_s3(video_url, file_name):
+    url_key = normalize_url(video_url)
+    s3_url = _streamed_objects.get(url_key)
+    if s3_url:
+        return s3_url
+
+    cache = get_download_cache()
+    known_key = cache.key_for_url(video_url) if cache else None
+    if known_key and cache.contains(known_key):
+        return None
+
+    info = resolve_streamable_format(video_url)
+    if not info:
+        return None
+    key = cache_key(video_url, info.get('extractor_key'), info.get('id'))
+    s3_url = _streamed_objects.get(key)
+    if s3_url:
+        _streamed_objects.put(url_key, s3_url)
+        return s3_url
+    if cache and cache.contains(key):
+        return None
+
+    s3_url = stream_url_to_s3(info['url'], file_name, headers=info.get('http_headers'))
+    _streamed_objects.put(url_key, s3_url)
+    _streamed_objects.put(key, s3_url)
+    return s3_url
+
+# yt-dlp progress hook: report download percentage for the current job
+def _download_progress_hook(status):
+    if status.get('status') == 'downloading':
+        downloaded = status.get('downloaded_bytes') or 0
+        total = status.get('total_bytes') or status.get('total_bytes_estimate')
+        fields = {'bytes': downloaded}
+        if total:
+            fields['totalBytes'] = total
+            fields['percent'] = round(100.0 * downloaded / total, 1)
+        progress.report('download', **fields)
+    elif status.get('status') == 'finished':
+        progress.report('download', final=True, percent=100.0)
+
+# In-flight downloads keyed on normalized URL
+_download_flights = SingleFlight()
+
+# Download a video from a URL (social media support via yt-dlp, or any downloader with ytdlp_download's signature)
+def download_social_video(video_url, output_path, downloader=None):
     ydl_opts = {
         'outtmpl': output_path,
         'format': 'bestvideo+bestaudio/best', 
         'quiet': False,
         'verbose': True,
-        'continuedl': True
+        'continuedl': True,
+        'progress_hooks': [_download_progress_hook]
     }
     try:
-        with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([video_url])
+        # Concurrent requests for the same video share one download
+        leader_file, shared = _download_flights.do(normalize_url(video_url),
+                                                   lambda: _download_through_cache(video_url, ydl_opts, output_path, downloader))
+        if shared and leader_file != output_path:
+            # The leader's download is in the cache now; without a cache, link the leader's file if it is
+            # still there (its owner may remove it at any moment, and then it is downloaded again)
+            if get_download_cache():
+                _download_through_cache(video_url, ydl_opts, output_path, downloader)
+            else:
+                try:
+                    link_or_copy(leader_file, output_path)
+                except FileNotFoundError:
+                    _download_through_cache(video_url, ydl_opts, output_path, downloader)
     except youtube_dl.utils.DownloadError as e:
         logging.error(f"Download error: {e}")
         raise
 
-# Get video duration
+# The download step: resolve video_url with yt-dlp and download it, unless fetch_cached(key) places a
+# cached copy first. Returns (cache key, downloaded file), with the file None when the cache served it.
+def ytdlp_download(video_url, ydl_opts, fetch_cached):
+    with youtube_dl.YoutubeDL(ydl_opts) as ydl:
+        info_dict = ydl.extract_info(video_url, download=False)
+        key = cache_key(video_url, info_dict.get('extractor_key'), info_dict.get('id'))
+        if fetch_cached(key):
+            return key, None
+        info_dict = ydl.process_ie_result(info_dict, download=True)
+        return key, ydl.prepare_filename(info_dict)
+
+# Run a download, serving it from the local download cache when the same video was fetched before.
+# Returns the path of the downloaded (or cache-linked) file.
+def _download_through_cache(video_url, ydl_opts, output_path, downloader=None):
+    cache = get_download_cache()
+    if cache:
+        # A URL seen before maps straight to its entry without asking the extractor again
+        known_key = cache.key_for_url(video_url)
+        # The extractor path below counts the miss if the entry has gone
+        if known_key and cache.fetch(known_key, output_path, video_url, count_miss=False):
+            return output_path
+
+    key, video_file = (downloader or ytdlp_download)(
+        video_url, ydl_opts, lambda key: bool(cache) and cache.fetch(key, output_path, video_url))
+    if video_file is None:
+        return output_path
+
+    if not os.path.exists(video_file) and os.path.exists(output_path):
+        video_file = output_path
+    if cache and os.path.exists(video_file):
+        try:
+            cache.put(key, video_file, video_url)
+        except OSError as e:
+            logging.warning(f"Could not add {video_file} to the download cache: {e}")
+    return video_file
+
+# Get video duration (from the shared, cached probe)
 def get_video_duration(video_file):
-    command = [
-        'ffprobe',
-        '-v', 'error',
-        '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        video_file
-    ]
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    return float(result.stdout.strip())
+    duration = probe(video_file).duration
+    if duration is None:
+        raise ProbeError(f"No duration reported for {video_file}")
+    return duration
 
 # Download video helper
 def download_video(video_url):
@@ -65,12 +358,10 @@ def download_video(video_url):
             'format': 'bestvideo+bestaudio/best',
             'outtmpl': os.path.join(UPLOAD_FOLDER, f'{uuid.uuid4().hex}.mp4'),
             'quiet': False,
-            'verbose': True
+            'verbose': True,
+            'progress_hooks': [_download_progress_hook]
         }
-        with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(video_url, download=True)
-            video_file = ydl.prepare_filename(info_dict)
-        return video_file
+        return _download_through_cache(video_url, ydl_opts, ydl_opts['outtmpl'])
     except Exception as e:
         logging.error(f"Error downloading video: {e}")
         return None
@@ -89,12 +380,10 @@ def generate_script(video_url):
 
 def generate_audio_from_script(script):
     try:
-        # You can choose either pyttsx3 or gTTS. Here is an example of pyttsx3:
-        engine = pyttsx3.init()
-        audio_file = os.path.join(UPLOAD_FOLDER, f"audio_{uuid.uuid4().hex}.mp3")
-        engine.save_to_file(script, audio_file)
-        engine.runAndWait()
-        return audio_file
+        # pyttsx3 unless TTS_ENGINE picks another engine
+        backend = get_tts_backend('pyttsx3')
+        audio_file = os.path.join(UPLOAD_FOLDER, f"audio_{uuid.uuid4().hex}{backend.extension}")
+        return synthesize_speech(script, audio_file, backend)
     except Exception as e:
         logging.error(f"Error generating audio: {e}")
         return None
@@ -150,15 +439,81 @@ def generate_audio_from_script(script):
 #         return None
 
 
-# Function to convert video to MP4 using ffmpeg
+# Codecs MP4 can carry without re-encoding
+MP4_VIDEO_CODECS = {'h264', 'hevc', 'mpeg4', 'av1'}
+MP4_AUDIO_CODECS = {'aac', 'mp3', 'alac'}
+
+# Mux audio_file as the only audio track of video_file. The video stream is copied; audio is copied
+# when MP4 can hold it and encoded to AAC otherwise. Returns output_file, or None when the video
+# codec can't go into MP4 as-is or ffmpeg fails (callers fall back to a full re-encode).
+def replace_audio(video_file, audio_file, output_file):
+    try:
+        video_info = probe(video_file)
+        audio_info = probe(audio_file)
+    except ProbeError as e:
+        logging.error(f"Error probing inputs for muxing: {e.stderr}")
+        return None
+    if not video_info.video or not audio_info.audio:
+        logging.error("Muxing needs a video stream and an audio stream.")
+        return None
+    if video_info.video_codec not in MP4_VIDEO_CODECS:
+        logging.info(f"Video codec {video_info.video_codec} can't be stream-copied into MP4.")
+        return None
+
+    audio_codec = ['-c:a', 'copy'] if audio_info.audio_codec in MP4_AUDIO_CODECS else ['-c:a', 'aac', '-b:a', '192k']
+    command = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-i', video_file, '-i', audio_file,
+        '-map', '0:v:0', '-map', '1:a:0',
+        '-c:v', 'copy'
+    ] + audio_codec + [output_file]
+    try:
+        subprocess.run(command, check=True, stderr=subprocess.PIPE, text=True)
+        return output_file
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Error muxing audio into video: {e.stderr}")
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        return None
+
+# Decide how much work turning input_file into an H.264/AAC MP4 takes:
+#   'none'      - already an MP4 with H.264 video and AAC (or no) audio
+#   'remux'     - the codecs are right but the container isn't; copy the streams into MP4
+#   'transcode' - at least one stream needs re-encoding
+# Returns (plan, ffmpeg codec arguments).
+def plan_mp4_conversion(input_file):
+    info = probe(input_file)
+    video_ok = info.video_codec == 'h264'
+    audio_ok = info.audio is None or info.audio_codec == 'aac'
+    # ffprobe reports MP4 and MOV alike as "mov,mp4,...", so the extension decides between them
+    container_ok = 'mp4' in info.format_names and os.path.splitext(input_file)[1].lower() == '.mp4'
+
+    if video_ok and audio_ok:
+        return ('none' if container_ok else 'remux'), ['-c', 'copy']
+    # Only the streams that differ are re-encoded
+    video_args = ['-c:v', 'copy'] if video_ok else ['-c:v', 'libx264']
+    audio_args = ['-c:a', 'copy'] if audio_ok else ['-c:a', 'aac']
+    return 'transcode', video_args + audio_args
+
+# Function to convert video to MP4 using ffmpeg. Returns input_file itself when it already is an
+# H.264/AAC MP4, and only re-encodes streams whose codec differs.
 def convert_video_to_mp4(input_file, output_file):
     try:
-        # Running the ffmpeg command to convert the video
-        subprocess.run([
-            'ffmpeg', '-i', input_file, '-vcodec', 'libx264', '-acodec', 'aac', '-strict', 'experimental', output_file
-        ], check=True)
+        plan, codec_args = plan_mp4_conversion(input_file)
+        if plan == 'none':
+            logging.info(f"Video already H.264/AAC MP4, skipping conversion: {input_file}")
+            return input_file
+
+        logging.info(f"Converting {input_file} to MP4 ({plan}).")
+        duration = probe(input_file).duration  # Only used for the progress percentage
+        progress.run_ffmpeg([
+            'ffmpeg', '-y', '-i', input_file, '-map', '0:v:0', '-map', '0:a:0?'
+        ] + codec_args + [output_file], duration=duration)
         logging.info(f"Video successfully converted: {output_file}")
         return output_file
+    except ProbeError as e:
+        logging.error(f"Error probing video for conversion: {e.stderr}")
+        return None
     except subprocess.CalledProcessError as e:
         logging.error(f"Error converting video: {e.stderr}")
         return None
@@ -166,87 +521,59 @@ def convert_video_to_mp4(input_file, output_file):
         logging.error(f"Unexpected error during video conversion: {e}")
         return None
 
-# Function to process video with AI script and generate the final output
-def process_AI_video(video_file, segment_length, script):
+# Put audio_file under video_file: stream copy when the codecs allow, a full re-encode otherwise
+def _mux_audio(video_file, audio_file, output_file):
+    if replace_audio(video_file, audio_file, output_file):
+        return output_file
+    try:
+        duration = probe(video_file).duration  # Only used for the progress percentage
+        progress.run_ffmpeg([
+            'ffmpeg', '-y', '-i', video_file, '-i', audio_file, '-map', '0:v:0', '-map', '1:a:0',
+            '-c:v', 'libx264', '-c:a', 'aac', output_file
+        ], duration=duration)
+        return output_file
+    except (ProbeError, subprocess.CalledProcessError) as e:
+        logging.error(f"Error adding audio to video: {e}")
+        return None
+
+# Apply per-segment video effects. segment_effects[i] is an ffmpeg video filter for segment i
+# (None leaves it untouched). Segments are encoded in parallel across the available CPUs and
+# joined by the concat demuxer without another encode. Returns the joined (silent) video.
+def _apply_segment_effects(video_file, segment_length, segment_effects):
+    joined_video = os.path.join(UPLOAD_FOLDER, f"final_video_{uuid.uuid4().hex}.mp4")
+    return transcode_segments(video_file, int(segment_length), joined_video, segment_effects=segment_effects)
+
+# Function to process video with AI script and generate the final output.
+# Splitting into segments and concatenating them again without changing them reproduces the input,
+# so unless segment_effects asks for per-segment work the video goes straight to a single audio-replace mux.
+def process_AI_video(video_file, segment_length, script, segment_effects=None):
     try:
         # Generate audio from the script
         audio_file = generate_audio_from_script(script)
         if not audio_file:
             raise ValueError("Failed to generate audio from script.")
 
-        # Get the video duration using ffprobe and capture detailed errors
-        try:
-            video_info = ffmpeg.probe(video_file, cmd='ffprobe',  v='error', select_streams='v:0', show_entries='stream=duration')
-            video_duration = float(video_info['streams'][0]['duration'])
-        except subprocess.CalledProcessError as e:
-            logging.error(f"ffprobe error while fetching video duration: {e.stderr.decode('utf-8')}")
-            logging.error(f"ffprobe error: {e.stderr}")
-            return None
-        except Exception as e:
-            logging.error(f"Error getting video duration: {str(e)}")
-            return None
-
-        # Split video into segments
-        segments = []
-        for start_time in range(0, int(video_duration), int(segment_length)):
-            end_time = min(start_time + int(segment_length), video_duration)
-
-            # Extract the segment using ffmpeg and handle errors
+        source_video = video_file
+        if segment_effects and any(segment_effects):
             try:
-                segment_output = os.path.join(UPLOAD_FOLDER, f"segment_{uuid.uuid4().hex}.mp4")
-                ffmpeg.input(video_file, ss=start_time, t=end_time-start_time).output(segment_output).run()
-                segments.append(segment_output)
-            except ffmpeg.Error as e:
-                logging.error(f"Error extracting video segment from {start_time} to {end_time}: {e.stderr}")
-                return None
-            except Exception as e:
-                logging.error(f"Error processing video segment: {e}")
+                source_video = _apply_segment_effects(video_file, segment_length, segment_effects)
+            except subprocess.CalledProcessError as e:
+                logging.error(f"Error processing video segments: {e.stderr}")
                 return None
 
-        # Concatenate the video segments
-        concat_file = os.path.join(UPLOAD_FOLDER, f"concat_list_{uuid.uuid4().hex}.txt")
-        try:
-            with open(concat_file, 'w') as f:
-                for segment in segments:
-                    f.write(f"file '{segment}'\n")
-        except Exception as e:
-            logging.error(f"Error creating concat file: {e}")
-            return None
-
-        final_video_output = os.path.join(UPLOAD_FOLDER, f"final_video_{uuid.uuid4().hex}.mp4")
-        
-        # Concatenate video segments using ffmpeg and handle errors
-        try:
-            ffmpeg.input(concat_file, format='concat', safe=0).output(final_video_output).run()
-        except ffmpeg.Error as e:
-            logging.error(f"Error concatenating video segments: {e.stderr}")
-            return None
-        except Exception as e:
-            logging.error(f"Error processing concatenation: {e}")
-            return None
-
-        # Add the generated audio to the final video
+        # Add the generated audio to the video
         final_video_with_audio = os.path.join(UPLOAD_FOLDER, f"final_video_with_audio_{uuid.uuid4().hex}.mp4")
-        try:
-            ffmpeg.input(final_video_output).input(audio_file).output(final_video_with_audio, vcodec='libx264', acodec='aac').run()
-        except ffmpeg.Error as e:
-            logging.error(f"Error adding audio to video: {e.stderr}")
-            return None
-        except Exception as e:
-            logging.error(f"Error processing audio addition: {e}")
-            return None
+        result = _mux_audio(source_video, audio_file, final_video_with_audio)
 
         # Clean up temporary files
         try:
-            os.remove(concat_file)
-            for segment in segments:
-                os.remove(segment)
-            os.remove(final_video_output)
+            if source_video != video_file:
+                os.remove(source_video)
             os.remove(audio_file)
         except Exception as e:
             logging.error(f"Error cleaning up temporary files: {e}")
 
-        return final_video_with_audio
+        return result
 
     except Exception as e:
         logging.error(f"Error processing video: {e}")
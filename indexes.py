@@ -0,0 +1,53 @@
+# indexes.py
+import os
+import logging
+
+from pymongo import ASCENDING, DESCENDING
+
+# Configuration
+VIDEO_PROCESSING_TTL = int(os.getenv('VIDEO_PROCESSING_TTL', 24 * 60 * 60))  # Seconds before a stuck "processing" record is dropped
+
+# Indexes on the videos collection: name -> (keys, options). Lookups by _id use Mongo's built-in index.
+VIDEO_INDEXES = {
+    # One record per source video
+    'video_url_1': ([('video_url', ASCENDING)], {'unique': True}),
+    # Newest-first keyset pagination (models.list_videos_page)
+    'created_at_id': ([('created_at', DESCENDING), ('_id', DESCENDING)], {}),
+    # The same listing filtered by status, e.g. dashboards of processing or failed videos
+    'status_created_at_id': ([('status', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], {}),
+    # Records still "processing" long after their last status change belong to crashed jobs; Mongo's TTL
+    # monitor removes them. status_at moves with every status change (models.update_video_status), and
+    # the partial filter keeps finished videos out of the index (and out of reach).
+    'stale_processing_ttl': ([('status_at', ASCENDING)], {
+        'expireAfterSeconds': VIDEO_PROCESSING_TTL,
+        'partialFilterExpression': {'status': 'processing'},
+    }),
+}
+
+
+def _matches(current, keys, options):
+    if [tuple(key) for key in current['key']] != keys:
+        return False
+    return all(current.get(option) == value for option, value in options.items())
+
+
+# Create the declared indexes that are missing and bring changed ones up to date. Safe to run on every
+# start: indexes that already match are left alone, a changed TTL is updated in place with collMod, and
+# anything else that changed is dropped and rebuilt.
+def ensure_indexes(collection, indexes=VIDEO_INDEXES):
+    existing = collection.index_information()
+    for name, (keys, options) in indexes.items():
+        current = existing.get(name)
+        if current is not None:
+            if _matches(current, keys, options):
+                continue
+            other_options = {option: value for option, value in options.items() if option != 'expireAfterSeconds'}
+            if 'expireAfterSeconds' in options and _matches(current, keys, other_options):
+                collection.database.command('collMod', collection.name,
+                                            index={'name': name, 'expireAfterSeconds': options['expireAfterSeconds']})
+                logging.info(f"Updated TTL of index {name} on {collection.name}")
+                continue
+            logging.warning(f"Index {name} on {collection.name} changed, rebuilding it")
+            collection.drop_index(name)
+        collection.create_index(keys, name=name, **options)
+        logging.info(f"Created index {name} on {collection.name}")
@@ -0,0 +1,213 @@
+# jobs.py
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+# Celery workers import this module directly (`celery -A jobs:celery_app`), so .env is loaded here too,
+# before the local modules below read their configuration
+load_dotenv()
+
+import progress
+
+# Configuration
+JOB_BACKEND = os.getenv('JOB_BACKEND', 'local')  # 'local' (in-process thread pool) or 'celery'
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))  # Background workers for the local backend
+JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', 60 * 60))  # Seconds finished jobs stay queryable
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+JOB_MODULES = os.getenv('JOB_MODULES', 'app').split(',')  # Modules a Celery worker imports to find job functions
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+# name -> (function, error message reported when it raises something other than JobError)
+_job_functions = {}
+
+
+# Expected job failure; its message is reported to the client as the job's error
+class JobError(Exception):
+    pass
+
+
+# Register a function as a job. Its keyword arguments and return value must be JSON-serializable.
+def job(name, error_message='Job failed'):
+    def decorator(fn):
+        _job_functions[name] = (fn, error_message)
+        return fn
+    return decorator
+
+
+# Run a registered job in the current thread and return its result
+def run_job(name, kwargs):
+    fn, _ = _job_functions[name]
+    return fn(**kwargs)
+
+
+# The error fields recorded for a failed job
+def describe_failure(name, error):
+    if isinstance(error, JobError):
+        return {'error': str(error)}
+    _, error_message = _job_functions.get(name, (None, 'Job failed'))
+    return {'error': error_message, 'details': str(error)}
+
+
+class Job:
+    def __init__(self, job_id, name, status=QUEUED, result=None, error=None):
+        self.id = job_id
+        self.name = name
+        self.status = status
+        self.result = result
+        self.error = error  # dict with 'error' and optionally 'details'
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    def to_dict(self):
+        data = {
+            'jobId': self.id,
+            'name': self.name,
+            'status': self.status,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at
+        }
+        if self.result is not None:
+            data['result'] = self.result
+        if self.error:
+            data.update(self.error)
+        return data
+
+
+class LocalJobBackend:
+    """Runs jobs on an in-process thread pool and keeps their state in memory. Needs no broker."""
+
+    def __init__(self, workers=JOB_WORKERS, result_ttl=JOB_RESULT_TTL):
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-worker')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name, kwargs):
+        if name not in _job_functions:
+            raise KeyError(f"Unknown job: {name}")
+        job_record = Job(uuid.uuid4().hex, name)
+        with self._lock:
+            self._prune()
+            self._jobs[job_record.id] = job_record
+        progress.hub.open(job_record.id)
+        self._executor.submit(self._run, job_record, kwargs)
+        return job_record
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _set(self, job_record, **fields):
+        with self._lock:
+            for field, value in fields.items():
+                setattr(job_record, field, value)
+            job_record.updated_at = time.time()
+
+    def _run(self, job_record, kwargs):
+        self._set(job_record, status=RUNNING)
+        progress.hub.publish(job_record.id, 'status', {'status': RUNNING})
+        # Progress reported anywhere below this call is attributed to this job
+        token = progress.current_job_id.set(job_record.id)
+        try:
+            result = run_job(job_record.name, kwargs)
+        except Exception as e:
+            logging.error(f"Job {job_record.id} ({job_record.name}) failed: {e}")
+            self._set(job_record, status=FAILED, error=describe_failure(job_record.name, e))
+        else:
+            self._set(job_record, status=SUCCEEDED, result=result)
+        finally:
+            progress.current_job_id.reset(token)
+        progress.hub.close(job_record.id, data=job_record.to_dict())
+
+    # Forget finished jobs older than the result TTL
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job_record in self._jobs.items()
+                   if job_record.status in (SUCCEEDED, FAILED) and job_record.updated_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+            progress.hub.discard(job_id)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class CeleryJobBackend:
+    """Hands jobs to Celery workers (`celery -A jobs:celery_app worker`), state lives in the result backend."""
+
+    # Celery reports PENDING for ids it has never seen (or whose result expired), so submit() records
+    # SENT before publishing and PENDING is treated as unknown
+    _states = {'SENT': QUEUED, 'RECEIVED': QUEUED, 'RETRY': QUEUED,
+               'STARTED': RUNNING, 'SUCCESS': SUCCEEDED, 'FAILURE': FAILED}
+
+    def __init__(self):
+        from celery import Celery
+
+        self.celery = Celery('jobs', broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND, include=JOB_MODULES)
+        self.celery.conf.update(task_track_started=True, result_expires=JOB_RESULT_TTL,
+                                task_serializer='json', result_serializer='json', accept_content=['json'])
+        self._task = self.celery.task(name='jobs.run_job')(_run_celery_job)
+
+    def submit(self, name, kwargs):
+        if name not in _job_functions:
+            raise KeyError(f"Unknown job: {name}")
+        task_id = uuid.uuid4().hex
+        # Stored before the task is published so a fast worker's STARTED can't be overwritten by it
+        self.celery.backend.store_result(task_id, None, 'SENT')
+        self._task.apply_async((name, kwargs), task_id=task_id)
+        return Job(task_id, name)
+
+    # The job's state, or None for an unknown or expired id
+    def get(self, job_id):
+        async_result = self.celery.AsyncResult(job_id)
+        if async_result.state not in self._states:
+            return None
+        job_record = Job(job_id, None, status=self._states[async_result.state])
+        if job_record.status == SUCCEEDED:
+            outcome = async_result.result
+            if outcome.get('failed'):
+                job_record.status = FAILED
+                job_record.error = outcome['error']
+            else:
+                job_record.result = outcome['result']
+        elif job_record.status == FAILED:
+            job_record.error = {'error': 'Job failed', 'details': str(async_result.result)}
+        return job_record
+
+    def shutdown(self, wait=True):
+        pass
+
+
+# Celery task body: failures are returned as data so the message shown matches the local backend
+def _run_celery_job(name, kwargs):
+    try:
+        return {'failed': False, 'result': run_job(name, kwargs)}
+    except Exception as e:
+        logging.error(f"Job {name} failed: {e}")
+        return {'failed': True, 'error': describe_failure(name, e)}
+
+
+_job_backend = None
+_job_backend_lock = threading.Lock()
+
+def get_job_backend():
+    global _job_backend
+    if _job_backend is None:
+        with _job_backend_lock:
+            if _job_backend is None:
+                _job_backend = CeleryJobBackend() if JOB_BACKEND == 'celery' else LocalJobBackend()
+    return _job_backend
+
+
+# Celery entry point for `celery -A jobs:celery_app worker`
+celery_app = get_job_backend().celery if JOB_BACKEND == 'celery' else None
@@ -0,0 +1,120 @@
+# media_probe.py
+import os
+import json
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+
+# Configuration
+PROBE_CACHE_SIZE = int(os.getenv('PROBE_CACHE_SIZE', 256))  # Probe results kept in memory
+
+
+class ProbeError(Exception):
+    def __init__(self, message, stderr=None):
+        super().__init__(message)
+        self.stderr = stderr
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class StreamInfo:
+    __slots__ = ('index', 'codec_type', 'codec_name', 'duration', 'width', 'height',
+                 'frame_rate', 'sample_rate', 'channels', 'bit_rate')
+
+    def __init__(self, stream):
+        self.index = stream.get('index')
+        self.codec_type = stream.get('codec_type')
+        self.codec_name = stream.get('codec_name')
+        self.duration = _float(stream.get('duration'))
+        self.width = _int(stream.get('width'))
+        self.height = _int(stream.get('height'))
+        self.frame_rate = stream.get('avg_frame_rate')
+        self.sample_rate = _int(stream.get('sample_rate'))
+        self.channels = _int(stream.get('channels'))
+        self.bit_rate = _int(stream.get('bit_rate'))
+
+
+class MediaInfo:
+    """Format and stream metadata from one ffprobe run."""
+
+    __slots__ = ('path', 'format_names', 'duration', 'size', 'bit_rate', 'streams')
+
+    def __init__(self, path, data):
+        format_data = data.get('format', {})
+        self.path = path
+        self.format_names = tuple(format_data.get('format_name', '').split(','))
+        self.duration = _float(format_data.get('duration'))
+        self.size = _int(format_data.get('size'))
+        self.bit_rate = _int(format_data.get('bit_rate'))
+        self.streams = tuple(StreamInfo(stream) for stream in data.get('streams', []))
+
+    def _first(self, codec_type):
+        return next((stream for stream in self.streams if stream.codec_type == codec_type), None)
+
+    @property
+    def video(self):
+        return self._first('video')
+
+    @property
+    def audio(self):
+        return self._first('audio')
+
+    @property
+    def video_codec(self):
+        return self.video.codec_name if self.video else None
+
+    @property
+    def audio_codec(self):
+        return self.audio.codec_name if self.audio else None
+
+    @property
+    def audio_duration(self):
+        # Audio-only files report their duration on the stream; fall back to the container's
+        return (self.audio.duration if self.audio else None) or self.duration
+
+
+_probe_cache = OrderedDict()
+_probe_cache_lock = threading.Lock()
+
+
+# Probe a media file once with ffprobe (format plus all streams, JSON output).
+# Results are cached on (path, size, mtime), so a rewritten file is probed again.
+def probe(path):
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise ProbeError(f"Cannot probe {path}: {e}")
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    with _probe_cache_lock:
+        info = _probe_cache.get(key)
+        if info is not None:
+            _probe_cache.move_to_end(key)
+            return info
+
+    result = subprocess.run([
+        'ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        logging.error(f"ffprobe failed for {path}: {result.stderr}")
+        raise ProbeError(f"ffprobe failed for {path}", result.stderr)
+    info = MediaInfo(path, json.loads(result.stdout or '{}'))
+
+    with _probe_cache_lock:
+        _probe_cache[key] = info
+        while len(_probe_cache) > PROBE_CACHE_SIZE:
+            _probe_cache.popitem(last=False)
+    return info
@@ -0,0 +1,91 @@
+# memory_cache.py
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU cache with a TTL per entry, counting hits and misses."""
+
+    def __init__(self, max_entries=1024, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (value, stored_at), least recently used first
+        self._generation = 0  # Bumped by every pop/clear, so loads that overlap one are not stored
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        if time.monotonic() - entry[1] > self.ttl:
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    # Return the cached value for key, or default on a miss or expired entry
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def _store(self, key, value):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    # Read-through: the cached value for key, or load() returned on a miss and stored unless it is
+    # None (nothing there yet, e.g. a record whose insert is still buffered) or an invalidation came
+    # while it ran: a load that started before a write reached the database may have read the old data.
+    def get_or_load(self, key, load):
+        with self._lock:
+            generation = self._generation
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = load()
+            if value is not None:
+                with self._lock:
+                    if self._generation == generation:
+                        self._store(key, value)
+        return value
+
+    def pop(self, key):
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+            }
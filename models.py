@@ -1,26 +1,67 @@
 from flask_pymongo import PyMongo
+from pymongo import DESCENDING, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from bson import ObjectId, json_util
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
+import os
+import atexit
+import base64
 import json
 import logging
 import uuid
 
+from write_buffer import WriteBehindBuffer
+from indexes import ensure_indexes
+from memory_cache import MemoryCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Configuration
+VIDEO_WRITE_BATCH_SIZE = int(os.getenv('VIDEO_WRITE_BATCH_SIZE', 100))  # Writes sent to Mongo in one bulk_write
+VIDEO_WRITE_MAX_DELAY = float(os.getenv('VIDEO_WRITE_MAX_DELAY', 1.0))  # Seconds a write may wait for its batch
+VIDEO_WRITE_WAIT_TIMEOUT = float(os.getenv('VIDEO_WRITE_WAIT_TIMEOUT', 10))  # Seconds save_video(wait=True) waits for the buffer
+
+VIDEO_CACHE_SIZE = int(os.getenv('VIDEO_CACHE_SIZE', 1024))  # Video records kept in memory
+VIDEO_PAGE_CACHE_SIZE = int(os.getenv('VIDEO_PAGE_CACHE_SIZE', 128))  # Listing pages kept in memory
+VIDEO_CACHE_TTL = float(os.getenv('VIDEO_CACHE_TTL', 30))  # Seconds; bounds staleness from other processes' writes
+
+CREATED_AT_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Read-through caches in front of Mongo, invalidated when this process's writes reach the database
+video_cache = MemoryCache(VIDEO_CACHE_SIZE, VIDEO_CACHE_TTL)
+video_page_cache = MemoryCache(VIDEO_PAGE_CACHE_SIZE, VIDEO_CACHE_TTL)
+
 # Initialize PyMongo (MongoDB client)
 mongo = None
+# Write-behind buffer for save_video/update_video_url, created by init_db
+video_writes = None
 
 def init_db(app):
-    global mongo
+    global mongo, video_writes
     mongo = PyMongo(app)  # Initialize PyMongo with the app
-    # Ensure the video collection is available in MongoDB
-    mongo.db.videos.create_index([('video_url', 1)], unique=True)
+    video_writes = WriteBehindBuffer(_write_video_batch, VIDEO_WRITE_BATCH_SIZE, VIDEO_WRITE_MAX_DELAY,
+                                     name='video-writes')
+    # Whatever is still buffered at shutdown gets written before the process exits
+    atexit.register(video_writes.close)
+    # Ensure the video collection and its indexes are available in MongoDB
+    ensure_indexes(mongo.db.videos)
 
 
 # Video class with new fields
+# __slots__ keeps per-instance memory small when many records are held at once (no __dict__)
 class Video:
+    __slots__ = ('video_url', 'segment_length', 'file_urls', 'processed_video_url', 'segments', 'script',
+                 'video_length', 'status', 'created_at')
+
     def __init__(self, video_url, segment_length, file_urls, processed_video_url=None, segments=None, script=None, status="processing"):
         # Constructor to initialize the video object with video_url, segment_length, and file_urls
         self.video_url = video_url  # URL or path to the generated video
         self.segment_length = segment_length  # Length of each segment in seconds
-        self.file_urls = file_urls  # JSON list of file URLs of video segments
+        self.file_urls = file_urls  # List of file URLs of video segments (or its JSON text)
         self.processed_video_url = processed_video_url  # URL of the processed video
         self.segments = segments if segments else []  # List of segments (URLs or metadata)
         self.script = script  # Script or description of the video
@@ -39,50 +80,188 @@ class Video:
             'script': self.script,
             'video_length': self.video_length,
             'status': self.status,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
+            'created_at': self.created_at.strftime(CREATED_AT_FORMAT)
         }
 
+
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Serialize video documents to JSON bytes. Uses orjson when it is installed (datetimes handled
+# natively, ObjectIds as strings); otherwise the standard library with the same output.
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default)
+    return json.dumps(value, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+# Write a batch of buffered (video_id, operation) pairs with one ordered bulk_write, so the writes for
+# a video land in the order they were made. A failed operation (e.g. a duplicate video_url) is logged
+# and the rest of the batch is written after it; the failures are returned as {index: WriteError} for
+# the write buffer to hand to whoever queued them. Cached copies of the touched videos and every
+# cached listing page are dropped once the batch is in the database.
+def _write_video_batch(batch):
+    operations = [operation for _, operation in batch]
+    errors = {}
+    start = 0
+    try:
+        while start < len(operations):
+            try:
+                mongo.db.videos.bulk_write(operations[start:], ordered=True)
+                break
+            except BulkWriteError as e:
+                error = e.details['writeErrors'][0]
+                index = start + error['index']
+                logging.error(f"Error writing video operation {operations[index]}: {error.get('errmsg')}")
+                error_class = DuplicateKeyError if error.get('code') == 11000 else WriteError
+                errors[index] = error_class(error.get('errmsg'), error.get('code'), error)
+                start = index + 1
+        return errors
+    finally:
+        for video_id, _ in batch:
+            video_cache.pop(video_id)
+        video_page_cache.clear()
+
 # Function to save the video to MongoDB
-def save_video(video_url, segment_length, file_urls, processed_video_url=None, segments=None, script=None, status="processing"):
+# The insert is buffered and written in a batch shortly after; the _id is assigned here so the
+# returned record can be updated straight away. The record is returned before it reaches Mongo, and
+# an insert that fails there (e.g. a duplicate video_url) is only logged, unless wait is set: then
+# save_video blocks until the batch is written and returns None if the insert failed. If the batch is
+# not written within VIDEO_WRITE_WAIT_TIMEOUT the record is inserted directly instead.
+def save_video(video_url, segment_length, file_urls, processed_video_url=None, segments=None, script=None, status="processing",
+               wait=False):
     video = Video(video_url, segment_length, file_urls, processed_video_url, segments, script, status)
     video_data = video.to_dict()
+    video_data['_id'] = ObjectId()
+    # Real date of the last status change, for the TTL on stale "processing" records (created_at is text)
+    video_data['status_at'] = video.created_at
 
-    # Insert the video data into the MongoDB 'videos' collection
+    # Queue the video data for the MongoDB 'videos' collection
     try:
-        mongo.db.videos.insert_one(video_data)
-        logging.info(f"Video saved to MongoDB with URL: {video_url}")
+        written = video_writes.add((video_data['_id'], InsertOne(video_data)))
+        logging.info(f"Video queued for MongoDB with URL: {video_url}")
+        if wait:
+            written.result(timeout=VIDEO_WRITE_WAIT_TIMEOUT)
+    except FutureTimeoutError:
+        logging.warning(f"Buffered insert of {video_url} not written after {VIDEO_WRITE_WAIT_TIMEOUT}s, inserting it directly")
+        return _insert_video_now(video_data)
     except Exception as e:
         logging.error(f"Error inserting video into MongoDB: {str(e)}")
         return None
 
     return video_data
 
-# Function to get all videos from MongoDB
-def get_all_videos():
-    videos = mongo.db.videos.find()
-    video_list = []
-    for video in videos:
-        video_list.append({
-            'video_url': video['video_url'],
-            'segment_length': video['segment_length'],
-            'file_urls': video['file_urls'],
-            'processed_video_url': video.get('processed_video_url'),
-            'segments': video.get('segments'),
-            'script': video.get('script'),
-            'video_length': video['video_length'],
-            'status': video['status'],
-            'created_at': video['created_at']
-        })
-    return video_list
-
-# Function to update a video URL if needed
+# Insert a record that is also still in the write buffer. Whichever of the two writes lands second fails
+# on the duplicate _id, which is fine; a duplicate video_url fails both and returns None.
+def _insert_video_now(video_data):
+    try:
+        mongo.db.videos.insert_one(dict(video_data))
+    except DuplicateKeyError:
+        if mongo.db.videos.find_one({'_id': video_data['_id']}, {'_id': 1}) is None:
+            logging.error(f"Error inserting video into MongoDB: duplicate video_url {video_data['video_url']}")
+            return None
+    except Exception as e:
+        logging.error(f"Error inserting video into MongoDB: {str(e)}")
+        return None
+    video_cache.pop(video_data['_id'])
+    video_page_cache.clear()
+    return video_data
+
+# Set a video's status together with status_at, the real date of the change, so the TTL on stale
+# "processing" records counts from the last status change. Other fields (e.g. the finished file_urls)
+# can be set in the same write. Buffered like save_video, and written after it.
+def update_video_status(video_id, status, **fields):
+    fields.update(status=status, status_at=datetime.utcnow())
+    try:
+        video_writes.add((video_id, UpdateOne({'_id': video_id}, {'$set': fields})))
+        logging.info(f"Video status update to {status} queued for video ID: {video_id}")
+    except Exception as e:
+        logging.error(f"Error updating video status: {str(e)}")
+        return None
+
+# Record that processing of video_url has started and return the record's _id: a new "processing"
+# record, or the existing one for the same URL (video_url is unique) put back into "processing".
+# Waits for the insert so a duplicate URL is known here; None if the record could not be written.
+def start_video(video_url, segment_length):
+    video = save_video(video_url, segment_length, [], wait=True)
+    if video is not None:
+        return video['_id']
+    existing = mongo.db.videos.find_one({'video_url': video_url}, {'_id': 1})
+    if existing is None:
+        return None
+    update_video_status(existing['_id'], 'processing')
+    return existing['_id']
+
+# One stored video by _id (None if there is none, or its insert is still buffered), read through the
+# in-memory cache. Misses are not cached, so the record shows up as soon as its insert is written.
+def get_video(video_id):
+    return video_cache.get_or_load(video_id, lambda: mongo.db.videos.find_one({'_id': video_id}))
+
+# Function to update a video URL if needed (buffered like save_video, and written after it)
 def update_video_url(video_id, new_video_url):
     try:
-        mongo.db.videos.update_one(
+        video_writes.add((video_id, UpdateOne(
             {'_id': video_id},
             {'$set': {'video_url': new_video_url}}
-        )
-        logging.info(f"Video URL updated for video ID: {video_id}")
+        )))
+        logging.info(f"Video URL update queued for video ID: {video_id}")
     except Exception as e:
         logging.error(f"Error updating video URL: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+
+# Fields returned by the video listing; everything else (script, segments) stays in Mongo
+VIDEO_LIST_FIELDS = ('video_url', 'file_urls', 'processed_video_url', 'status', 'video_length', 'created_at')
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Opaque page cursor: the sort key (created_at, _id) of the last video on the previous page
+def encode_cursor(video):
+    key = json_util.dumps([video['created_at'], video['_id']])
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+
+# The decoded values go straight into a query, so anything but the expected types (an operator
+# document such as {"$gt": ""} in particular) is rejected
+def decode_cursor(cursor):
+    try:
+        created_at, video_id = json_util.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    if not isinstance(created_at, str) or not isinstance(video_id, ObjectId):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return created_at, video_id
+
+
+# One page of videos (a list of documents), newest first, from the (created_at, _id) index, or the
+# (status, created_at, _id) index when filtered by status. Pages continue after the cursor of the
+# previous page instead of skipping, so deep pages cost the same as the first, and only `fields`
+# (plus _id) are read. Pages are read through the in-memory page cache.
+def list_videos_page(limit=20, cursor=None, fields=VIDEO_LIST_FIELDS, status=None):
+    query = {'status': status} if status else {}
+    if cursor:
+        created_at, video_id = decode_cursor(cursor)
+        query['$or'] = [
+            {'created_at': {'$lt': created_at}},
+            {'created_at': created_at, '_id': {'$lt': video_id}}
+        ]
+    projection = {field: 1 for field in fields}
+
+    def load():
+        return list(mongo.db.videos.find(query, projection)
+                    .sort([('created_at', DESCENDING), ('_id', DESCENDING)])
+                    .limit(limit)
+                    .batch_size(limit))
+
+    return video_page_cache.get_or_load((limit, cursor, tuple(fields), status), load)
+
+
+# Hit rates of the video caches, for sizing VIDEO_CACHE_SIZE and VIDEO_PAGE_CACHE_SIZE
+def cache_stats():
+    return {'videos': video_cache.stats(), 'pages': video_page_cache.stats()}
@@ -0,0 +1,76 @@
+# pipeline.py
+import os
+import queue
+import threading
+import logging
+import contextvars
+
+import progress
+from segmenter import segment_video
+
+# Configuration
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 4))  # Upload threads per pipeline
+MAX_PENDING_SEGMENTS = int(os.getenv('MAX_PENDING_SEGMENTS', 8))  # Segments allowed on disk awaiting upload
+
+
+# Upload segments on a pool of worker threads while the producer keeps cutting.
+# segments is any iterable of file paths (normally segment_video); upload(path, key) returns a URL.
+# Each file is removed after its upload and its slot released, which lets a paused producer continue.
+# Returns the upload results in segment order (None where an upload failed).
+def upload_in_order(segments, upload, slots=None, max_workers=UPLOAD_WORKERS, max_pending=MAX_PENDING_SEGMENTS,
+                    total=None):
+    tasks = queue.Queue(maxsize=max_pending)
+    results = {}
+    uploaded = [0]
+    uploaded_lock = threading.Lock()
+
+    def worker():
+        while True:
+            item = tasks.get()
+            if item is None:
+                return
+            index, segment_file = item
+            try:
+                results[index] = upload(segment_file, os.path.basename(segment_file))
+            except Exception as e:
+                logging.error(f"Error uploading segment {segment_file}: {e}")
+                results[index] = None
+            finally:
+                if os.path.exists(segment_file):
+                    os.remove(segment_file)
+                if slots is not None:
+                    slots.release()
+                with uploaded_lock:
+                    uploaded[0] += 1
+                    done = uploaded[0]
+                progress.report('upload-segments', final=True, uploaded=done, total=total)
+
+    # Each worker gets its own copy of the caller's context so progress reports reach the caller's job
+    workers = [threading.Thread(target=contextvars.copy_context().run, args=(worker,), daemon=True)
+               for _ in range(max_workers)]
+    for thread in workers:
+        thread.start()
+
+    try:
+        # put() blocks while the queue is full, so a slow uploader throttles the producer
+        for index, segment_file in enumerate(segments):
+            progress.report('segment', final=True, index=index + 1, total=total)
+            tasks.put((index, segment_file))
+    finally:
+        for _ in workers:
+            tasks.put(None)
+        for thread in workers:
+            thread.join()
+
+    return [results[index] for index in sorted(results)]
+
+
+# Cut video_file with the segment muxer and upload the pieces concurrently.
+# Disk usage is capped at max_pending finished segments plus the one ffmpeg is writing.
+# total (expected segment count) is only used for progress reports.
+def segment_and_upload(video_file, segment_length, output_dir, upload, exact=False,
+                       max_workers=UPLOAD_WORKERS, max_pending=MAX_PENDING_SEGMENTS, total=None, duration=None):
+    slots = threading.BoundedSemaphore(max_pending)
+    segments = segment_video(video_file, segment_length, output_dir, exact=exact, slots=slots, duration=duration)
+    return upload_in_order(segments, upload, slots=slots, max_workers=max_workers, max_pending=max_pending,
+                           total=total)
@@ -0,0 +1,157 @@
+# progress.py
+import os
+import time
+import logging
+import threading
+import subprocess
+import contextvars
+from collections import deque
+
+# Configuration
+PROGRESS_HISTORY = int(os.getenv('PROGRESS_HISTORY', 200))  # Events kept per job for late subscribers
+PROGRESS_MIN_INTERVAL = float(os.getenv('PROGRESS_MIN_INTERVAL', 0.5))  # Seconds between updates of one stage
+
+# Id of the job the current thread is working for. Code deep in the pipeline reports progress
+# through report() without the job id being passed around.
+current_job_id = contextvars.ContextVar('current_job_id', default=None)
+
+
+class _Channel:
+    def __init__(self, history):
+        self.events = deque(maxlen=history)  # (seq, event, data)
+        self.seq = 0
+        self.closed = False
+        self.last_report = {}  # stage -> time of last published update
+        self.condition = threading.Condition()
+
+
+class ProgressHub:
+    """In-process event log per job that any number of subscribers can follow."""
+
+    def __init__(self, history=PROGRESS_HISTORY):
+        self.history = history
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def open(self, job_id):
+        with self._lock:
+            self._channels.setdefault(job_id, _Channel(self.history))
+
+    def _get(self, job_id):
+        with self._lock:
+            return self._channels.get(job_id)
+
+    def publish(self, job_id, event, data, throttle_key=None):
+        channel = self._get(job_id)
+        if channel is None:
+            return
+        with channel.condition:
+            if channel.closed:
+                return
+            if throttle_key is not None:
+                now = time.monotonic()
+                if now - channel.last_report.get(throttle_key, 0) < PROGRESS_MIN_INTERVAL:
+                    return
+                channel.last_report[throttle_key] = now
+            channel.seq += 1
+            channel.events.append((channel.seq, event, data))
+            channel.condition.notify_all()
+
+    # Publish the final event and wake subscribers so their streams can end
+    def close(self, job_id, event='done', data=None):
+        channel = self._get(job_id)
+        if channel is None:
+            return
+        with channel.condition:
+            channel.seq += 1
+            channel.events.append((channel.seq, event, data))
+            channel.closed = True
+            channel.condition.notify_all()
+
+    def discard(self, job_id):
+        with self._lock:
+            self._channels.pop(job_id, None)
+
+    def has(self, job_id):
+        return self._get(job_id) is not None
+
+    # Yield (seq, event, data) for events after seq `after`; yields None when nothing arrived within
+    # `heartbeat` seconds so the caller can keep the connection alive. Stops after the closing event.
+    def subscribe(self, job_id, after=0, heartbeat=15):
+        channel = self._get(job_id)
+        if channel is None:
+            return
+        while True:
+            with channel.condition:
+                pending = [item for item in channel.events if item[0] > after]
+                if not pending and not channel.closed:
+                    channel.condition.wait(heartbeat)
+                    pending = [item for item in channel.events if item[0] > after]
+                closed = channel.closed
+            if not pending:
+                if closed:
+                    return
+                yield None
+                continue
+            for item in pending:
+                after = item[0]
+                yield item
+            if closed and after >= channel.seq:
+                return
+
+
+hub = ProgressHub()
+
+
+# Report progress for the job running in this thread (no-op outside a job).
+# Updates of one stage are rate-limited unless final is set.
+def report(stage, final=False, **fields):
+    job_id = current_job_id.get()
+    if job_id is None:
+        return
+    fields['stage'] = stage
+    hub.publish(job_id, 'progress', fields, throttle_key=None if final else stage)
+
+
+# Report one line of ffmpeg's `-progress` output for stage; extra fields go into every report.
+# Returns False when the line is not progress output (all of which is key=value).
+def report_ffmpeg_line(line, duration=None, stage='encode', **extra):
+    key, separator, value = line.strip().partition('=')
+    if not separator:
+        return False
+    if key in ('out_time_us', 'out_time_ms') and value.isdigit():
+        # Despite its name out_time_ms is in microseconds as well
+        seconds = int(value) / 1_000_000
+        fields = dict(extra, seconds=round(seconds, 2))
+        if duration:
+            fields['percent'] = round(min(100.0, 100.0 * seconds / duration), 1)
+        report(stage, **fields)
+    elif key == 'progress' and value == 'end':
+        report(stage, final=True, percent=100.0, **extra)
+    return True
+
+
+# Run an ffmpeg command, reporting encode progress parsed from `-progress pipe:1`.
+# duration (seconds of output expected) lets the report include a percentage.
+# On failure the CalledProcessError carries the last STDERR_TAIL_LINES lines of ffmpeg's stderr.
+STDERR_TAIL_LINES = 50
+
+def run_ffmpeg(command, duration=None, stage='encode', **extra):
+    command = [command[0], '-progress', 'pipe:1', '-nostats'] + list(command[1:])
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    # stderr is drained on its own thread so a chatty ffmpeg never blocks on a full pipe
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    stderr_reader = threading.Thread(target=stderr_tail.extend, args=(process.stderr,), daemon=True)
+    stderr_reader.start()
+    try:
+        for line in process.stdout:
+            report_ffmpeg_line(line, duration, stage, **extra)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+        stderr_reader.join()
+        process.stderr.close()
+    if returncode != 0:
+        stderr = ''.join(stderr_tail)
+        logging.error(f"ffmpeg exited with status {returncode}: {' '.join(command)}\n{stderr}")
+        raise subprocess.CalledProcessError(returncode, command, stderr=stderr)
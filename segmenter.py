@@ -0,0 +1,105 @@
+# segmenter.py
+import os
+import glob
+import signal
+import subprocess
+import uuid
+import logging
+
+import progress
+
+
+# Build the single ffmpeg command that cuts the whole input with the segment muxer.
+# The finished segment names are written to stdout (one per line) as each piece is closed.
+# In exact mode ffmpeg's key=value `-progress` output for the re-encode is interleaved with them.
+def build_segment_command(video_file, segment_length, output_pattern, exact=False):
+    command = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin']
+    if exact:
+        command += ['-progress', 'pipe:1', '-nostats']
+    command += [
+        '-i', video_file,
+        # First video stream plus any audio; subtitle, data and attachment streams would trip the MP4 muxer
+        '-map', '0:v:0', '-map', '0:a?',
+    ]
+    if exact:
+        # Exact boundaries need a keyframe at every cut, so the video stream is re-encoded
+        # with forced keyframes. Audio is still copied.
+        command += [
+            '-c:v', 'libx264', '-preset', 'veryfast',
+            '-force_key_frames', f'expr:gte(t,n_forced*{segment_length})',
+            '-c:a', 'copy',
+        ]
+    else:
+        # Stream copy: pieces are cut on the nearest keyframe after each boundary.
+        command += ['-c', 'copy']
+    command += [
+        '-f', 'segment',
+        '-segment_time', str(segment_length),
+    ]
+    if exact:
+        # A forced keyframe can land a hair before the boundary it was forced for; without some
+        # slack the muxer skips it and cuts at the next natural keyframe instead
+        command += ['-segment_time_delta', '0.05']
+    command += [
+        '-reset_timestamps', '1',
+        '-segment_list', 'pipe:1',
+        '-segment_list_type', 'flat',
+        output_pattern,
+    ]
+    return command
+
+
+# Take a disk slot for a finished segment. While no slot is free ffmpeg is paused, so at most
+# the slot count plus the segment being written sit on disk at any time.
+def _acquire_slot(process, slots):
+    if slots.acquire(blocking=False):
+        return
+    paused = hasattr(signal, 'SIGSTOP') and process.poll() is None
+    if paused:
+        process.send_signal(signal.SIGSTOP)
+    try:
+        slots.acquire()
+    finally:
+        if paused and process.poll() is None:
+            process.send_signal(signal.SIGCONT)
+
+
+# Cut video_file into segment_length second pieces in one ffmpeg run.
+# Yields the path of each segment as soon as ffmpeg has finished writing it.
+# If slots (a semaphore) is given, one slot is taken per yielded segment and the consumer
+# must release it once the segment file has been removed. duration (seconds) lets the encode
+# progress of exact mode include a percentage.
+def segment_video(video_file, segment_length, output_dir, exact=False, slots=None, duration=None):
+    prefix = uuid.uuid4().hex
+    output_pattern = os.path.join(output_dir, f"{prefix}_segment_%05d.mp4")
+    command = build_segment_command(video_file, int(segment_length), output_pattern, exact)
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    handed_out = set()
+    try:
+        for line in process.stdout:
+            if progress.report_ffmpeg_line(line, duration, 'segment-encode'):
+                continue
+            name = line.strip()
+            if name:
+                segment_file = os.path.join(output_dir, os.path.basename(name))
+                if slots is not None:
+                    _acquire_slot(process, slots)
+                handed_out.add(segment_file)
+                yield segment_file
+
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            logging.error(f"ffmpeg segmenting failed: {stderr}")
+            raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
+    finally:
+        # The consumer may stop early (e.g. on an upload error); don't leave ffmpeg running.
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+            # Remove the pieces ffmpeg wrote but nobody picked up
+            for leftover in glob.glob(os.path.join(output_dir, f"{prefix}_segment_*.mp4")):
+                if leftover not in handed_out:
+                    os.remove(leftover)
+        process.stdout.close()
+        process.stderr.close()
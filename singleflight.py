@@ -0,0 +1,54 @@
+# singleflight.py
+import threading
+import logging
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key: the first caller runs the work, later callers
+    arriving while it is still running wait for it and get the same result (or exception)."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    # Run fn() for key unless an identical call is already in flight.
+    # Returns (result, shared), where shared is True for callers that waited on someone else's call.
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            logging.info(f"Joining in-flight call for {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # Completed calls are forgotten immediately; this coalesces, it does not cache
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
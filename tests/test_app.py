@@ -0,0 +1,17 @@
+# tests/test_app.py
+import pytest
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import app
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize('segment_length', [-5, 0, 'ten'])
+def test_process_video_rejects_bad_segment_lengths(client, segment_length):
+    response = client.post('/process-video', json={'url': 'https://example.com/video', 'segment_length': segment_length})
+
+    assert response.status_code == 400
+    assert response.get_json()['error']
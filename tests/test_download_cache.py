@@ -0,0 +1,58 @@
+# tests/test_download_cache.py
+import os
+import time
+
+import download_cache
+from download_cache import DownloadCache
+
+
+def write(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    return str(path)
+
+
+def test_reload_keeps_entries_of_files_with_old_mtime(tmp_path):
+    source = write(tmp_path / 'video.mp4', 10)
+    # yt-dlp stamps downloads with the server's Last-Modified, which may be years old
+    os.utime(source, (0, 0))
+    cache = DownloadCache(str(tmp_path / 'cache'), max_bytes=1000, ttl=60)
+    cache.put('key', source)
+
+    reloaded = DownloadCache(str(tmp_path / 'cache'), max_bytes=1000, ttl=60)
+
+    assert reloaded.get('key') is not None
+
+
+def test_reload_keeps_lru_order(tmp_path):
+    directory = str(tmp_path / 'cache')
+    cache = DownloadCache(directory, max_bytes=1000, ttl=60)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, write(tmp_path / f'{key}.mp4', 10))
+        time.sleep(0.01)
+    cache.get('a')  # 'b' is now the least recently used
+
+    reloaded = DownloadCache(directory, max_bytes=25, ttl=60)
+
+    assert reloaded.get('b') is None
+    assert reloaded.get('a') is not None and reloaded.get('c') is not None
+
+
+def test_fetch_survives_eviction_during_the_copy(tmp_path, monkeypatch):
+    cache = DownloadCache(str(tmp_path / 'cache'), max_bytes=1000, ttl=60)
+    cached_path = cache.put('key', write(tmp_path / 'video.mp4', 10))
+    link_or_copy = download_cache.link_or_copy
+
+    def evict_then_copy(source, destination):
+        # Another thread evicts the entry as soon as fetch() lets go of the lock
+        if destination == str(tmp_path / 'output.mp4'):
+            with cache._lock:
+                cache._remove('key')
+            assert not os.path.exists(cached_path)
+        link_or_copy(source, destination)
+
+    monkeypatch.setattr(download_cache, 'link_or_copy', evict_then_copy)
+
+    assert cache.fetch('key', str(tmp_path / 'output.mp4'))
+    assert os.path.getsize(tmp_path / 'output.mp4') == 10
+    assert os.listdir(tmp_path / 'cache') == []
@@ -0,0 +1,87 @@
+# tests/test_downloads.py
+import time
+import threading
+
+import pytest
+
+import helpers
+from download_cache import DownloadCache, cache_key
+
+VIDEO_URL = 'https://www.facebook.com/watch/?v=1234'
+
+
+class FakeDownloader:
+    """Stands in for ytdlp_download: takes `latency` to "download" a few bytes to the output template
+    and counts how often it actually downloads."""
+
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.downloads = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, video_url, ydl_opts, fetch_cached):
+        key = cache_key(video_url, 'Facebook', '1234')
+        if fetch_cached(key):
+            return key, None
+        with self._lock:
+            self.downloads += 1
+        time.sleep(self.latency)
+        with open(ydl_opts['outtmpl'], 'wb') as f:
+            f.write(b'video bytes')
+        return key, ydl_opts['outtmpl']
+
+
+def use_cache(tmp_path, monkeypatch, enabled=True):
+    cache = DownloadCache(str(tmp_path / 'cache'), max_bytes=1024 ** 2, ttl=60) if enabled else None
+    monkeypatch.setattr(helpers, 'get_download_cache', lambda: cache)
+    return cache
+
+
+def download_concurrently(tmp_path, downloader, callers):
+    outputs = [str(tmp_path / f'output_{index}.mp4') for index in range(callers)]
+    threads = [threading.Thread(target=helpers.download_social_video, args=(VIDEO_URL, output, downloader))
+               for output in outputs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outputs
+
+
+@pytest.mark.parametrize('cached', [True, False])
+def test_concurrent_callers_share_one_download(tmp_path, monkeypatch, cached):
+    use_cache(tmp_path, monkeypatch, cached)
+    downloader = FakeDownloader()
+
+    outputs = download_concurrently(tmp_path, downloader, 8)
+
+    assert downloader.downloads == 1
+    for output in outputs:
+        with open(output, 'rb') as f:
+            assert f.read() == b'video bytes'
+
+
+def test_repeat_download_is_served_from_cache(tmp_path, monkeypatch):
+    cache = use_cache(tmp_path, monkeypatch)
+    downloader = FakeDownloader(latency=0)
+
+    helpers.download_social_video(VIDEO_URL, str(tmp_path / 'first.mp4'), downloader)
+    helpers.download_social_video(VIDEO_URL + '&fbclid=abc', str(tmp_path / 'second.mp4'), downloader)
+
+    assert downloader.downloads == 1
+    assert cache.hits == 1
+
+
+def test_expired_alias_counts_one_miss(tmp_path, monkeypatch):
+    cache = use_cache(tmp_path, monkeypatch)
+    downloader = FakeDownloader(latency=0)
+    helpers.download_social_video(VIDEO_URL, str(tmp_path / 'first.mp4'), downloader)
+    assert cache.stats()['misses'] == 1
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    helpers.download_social_video(VIDEO_URL, str(tmp_path / 'second.mp4'), downloader)
+
+    # The alias lookup and the extractor lookup both miss, but it is one request for the video
+    assert downloader.downloads == 2
+    assert cache.stats()['misses'] == 2
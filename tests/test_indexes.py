@@ -0,0 +1,180 @@
+# tests/test_indexes.py
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import models
+from indexes import VIDEO_INDEXES, ensure_indexes
+from write_buffer import WriteBehindBuffer
+
+mongomock = pytest.importorskip('mongomock')
+
+# explain() needs a real mongod (mongomock has no query planner), e.g.
+#   TEST_MONGO_URI=mongodb://localhost:27017/ python -m pytest tests/test_indexes.py
+TEST_MONGO_URI = os.getenv('TEST_MONGO_URI')
+
+
+class CountingCollection:
+    """mongomock collection that counts index builds."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.created = []
+
+    def create_index(self, keys, **options):
+        self.created.append(options['name'])
+        return self.collection.create_index(keys, **options)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+def test_ensure_indexes_is_idempotent():
+    videos = CountingCollection(mongomock.MongoClient().db.videos)
+
+    ensure_indexes(videos)
+    assert sorted(videos.created) == sorted(VIDEO_INDEXES)
+    info = videos.index_information()
+    assert info['stale_processing_ttl']['partialFilterExpression'] == {'status': 'processing'}
+
+    videos.created.clear()
+    ensure_indexes(videos)
+    assert videos.created == []
+
+
+def test_changed_index_is_rebuilt():
+    videos = CountingCollection(mongomock.MongoClient().db.videos)
+    ensure_indexes(videos)
+    videos.created.clear()
+
+    indexes = dict(VIDEO_INDEXES)
+    keys, _ = indexes['status_created_at_id']
+    indexes['status_created_at_id'] = (keys, {'sparse': True})
+    ensure_indexes(videos, indexes)
+
+    assert videos.created == ['status_created_at_id']
+    assert videos.index_information()['status_created_at_id'].get('sparse') is True
+
+
+class UpdatingCollection:
+    """mongomock collection whose bulk_write also takes the driver's UpdateOne (mongomock 4.3 cannot),
+    writing operations one at a time and stopping at the first failure like an ordered bulk_write."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def bulk_write(self, operations, ordered=True):
+        for index, operation in enumerate(operations):
+            if isinstance(operation, UpdateOne):
+                self.collection.update_one(operation._filter, operation._doc, upsert=bool(operation._upsert))
+                continue
+            try:
+                self.collection.bulk_write([operation])
+            except BulkWriteError as e:
+                e.details['writeErrors'][0]['index'] = index
+                raise BulkWriteError(e.details)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+@pytest.fixture
+def videos(monkeypatch):
+    collection = UpdatingCollection(mongomock.MongoClient().db.videos)
+    ensure_indexes(collection)
+    monkeypatch.setattr(models, 'mongo', SimpleNamespace(db=SimpleNamespace(videos=collection)))
+    buffer = WriteBehindBuffer(models._write_video_batch, max_batch=100, max_delay=0.05, name='test-video-writes')
+    monkeypatch.setattr(models, 'video_writes', buffer)
+    yield collection
+    buffer.close()
+
+
+def test_status_update_moves_status_at(videos):
+    video_id = models.start_video("https://example.com/a.mp4", 10)
+    started_at = videos.find_one({'_id': video_id})['status_at']
+    # A stored status_at in the past, as for a record that has been processing for a while
+    videos.update_one({'_id': video_id}, {'$set': {'status_at': started_at - timedelta(hours=1)}})
+
+    models.update_video_status(video_id, 'completed', file_urls=['https://bucket.example/0.mp4'])
+    models.video_writes.flush()
+
+    video = videos.find_one({'_id': video_id})
+    assert video['status'] == 'completed'
+    assert video['file_urls'] == ['https://bucket.example/0.mp4']
+    assert video['status_at'] >= started_at
+
+
+def test_restarted_video_goes_back_to_processing(videos):
+    first = models.start_video("https://example.com/a.mp4", 10)
+    models.update_video_status(first, 'failed')
+    models.video_writes.flush()
+
+    assert models.start_video("https://example.com/a.mp4", 10) == first
+    models.video_writes.flush()
+    assert videos.find_one({'_id': first})['status'] == 'processing'
+    assert videos.count_documents({}) == 1
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+@pytest.fixture
+def real_videos():
+    if not TEST_MONGO_URI:
+        pytest.skip("TEST_MONGO_URI is not set")
+    from pymongo import MongoClient
+    client = MongoClient(TEST_MONGO_URI, serverSelectionTimeoutMS=2000)
+    collection = client.get_database('test_indexes').videos
+    collection.drop()
+    ensure_indexes(collection)
+    created_at = datetime(2024, 1, 1)
+    collection.insert_many([{
+        'video_url': f"https://example.com/{index}.mp4",
+        'status': ('processing', 'completed', 'failed')[index % 3],
+        'created_at': (created_at + timedelta(minutes=index)).strftime(models.CREATED_AT_FORMAT),
+        'status_at': created_at,
+    } for index in range(500)])
+    yield collection
+    collection.drop()
+    client.close()
+
+
+def _find(collection, query):
+    projection = {field: 1 for field in models.VIDEO_LIST_FIELDS}
+    return collection.find(query, projection).sort([('created_at', -1), ('_id', -1)]).limit(20)
+
+
+def _after(video):
+    return {'$or': [
+        {'created_at': {'$lt': video['created_at']}},
+        {'created_at': video['created_at'], '_id': {'$lt': video['_id']}}
+    ]}
+
+
+def test_supported_queries_use_indexes(real_videos):
+    last = _find(real_videos, {})[19]
+    processing = list(_find(real_videos, {'status': 'processing'}))[-1]
+    queries = {
+        'list': _find(real_videos, {}),
+        'list after cursor': _find(real_videos, _after(last)),
+        'status list': _find(real_videos, {'status': 'processing'}),
+        'status list after cursor': _find(real_videos, dict(_after(processing), status='processing')),
+        '_id': real_videos.find({'_id': last['_id']}),
+        'missing _id': real_videos.find({'_id': ObjectId()}),
+    }
+    for name, cursor in queries.items():
+        stages = set(_stages(cursor.explain()['queryPlanner']['winningPlan']))
+        assert 'COLLSCAN' not in stages, f"{name}: {stages}"
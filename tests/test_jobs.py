@@ -0,0 +1,37 @@
+# tests/test_jobs.py
+import pytest
+
+import jobs
+
+
+@jobs.job('test-echo')
+def echo_job(value):
+    return value
+
+
+@pytest.fixture
+def celery_backend(monkeypatch):
+    pytest.importorskip('celery')
+    monkeypatch.setattr(jobs, 'CELERY_BROKER_URL', 'memory://')
+    monkeypatch.setattr(jobs, 'CELERY_RESULT_BACKEND', 'cache+memory://')
+    monkeypatch.setattr(jobs, 'JOB_MODULES', [])
+    return jobs.CeleryJobBackend()
+
+
+def test_celery_unknown_job_is_not_found(celery_backend):
+    assert celery_backend.get('0' * 32) is None
+
+
+def test_celery_submitted_job_is_queued(celery_backend):
+    job_record = celery_backend.submit('test-echo', {'value': 1})
+
+    assert celery_backend.get(job_record.id).status == jobs.QUEUED
+
+
+def test_local_job_runs_and_unknown_job_is_not_found():
+    backend = jobs.LocalJobBackend(workers=1)
+    job_record = backend.submit('test-echo', {'value': 42})
+    backend.shutdown(wait=True)
+
+    assert backend.get(job_record.id).to_dict()['result'] == 42
+    assert backend.get('0' * 32) is None
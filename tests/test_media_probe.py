@@ -0,0 +1,63 @@
+# tests/test_media_probe.py
+import shutil
+import subprocess
+from collections import OrderedDict
+
+import pytest
+
+import media_probe
+
+pytestmark = pytest.mark.skipif(not shutil.which('ffmpeg'), reason="needs ffmpeg")
+
+
+def make_audio(path, seconds):
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'sine=frequency=300',
+                    '-t', str(seconds), '-c:a', 'pcm_s16le', str(path)], check=True)
+    return str(path)
+
+
+@pytest.fixture
+def ffprobe_runs(monkeypatch):
+    monkeypatch.setattr(media_probe, '_probe_cache', OrderedDict())
+    runs = []
+    run = subprocess.run
+
+    def counting_run(command, *args, **kwargs):
+        if command[0] == 'ffprobe':
+            runs.append(command[-1])
+        return run(command, *args, **kwargs)
+
+    monkeypatch.setattr(media_probe.subprocess, 'run', counting_run)
+    return runs
+
+
+def test_same_file_is_probed_once(tmp_path, ffprobe_runs):
+    path = make_audio(tmp_path / 'a.wav', 1)
+
+    first = media_probe.probe(path)
+    assert media_probe.probe(path) is first
+    assert first.audio_duration == pytest.approx(1, abs=0.05)
+    assert ffprobe_runs == [path]
+
+
+def test_rewritten_file_is_probed_again(tmp_path, ffprobe_runs):
+    path = make_audio(tmp_path / 'a.wav', 1)
+    media_probe.probe(path)
+
+    make_audio(path, 2)
+
+    assert media_probe.probe(path).audio_duration == pytest.approx(2, abs=0.05)
+    assert ffprobe_runs == [path, path]
+
+
+def test_cache_keeps_at_most_probe_cache_size_results(tmp_path, ffprobe_runs, monkeypatch):
+    monkeypatch.setattr(media_probe, 'PROBE_CACHE_SIZE', 2)
+    paths = [make_audio(tmp_path / f"{index}.wav", 1) for index in range(3)]
+
+    for path in paths:
+        media_probe.probe(path)
+    media_probe.probe(paths[2])  # Most recently used: still cached
+    media_probe.probe(paths[0])  # Least recently used: evicted by the third file
+
+    assert len(media_probe._probe_cache) == 2
+    assert ffprobe_runs == paths + [paths[0]]
@@ -0,0 +1,44 @@
+# tests/test_memory_cache.py
+import threading
+
+from memory_cache import MemoryCache
+
+
+def test_missing_values_are_not_cached():
+    cache = MemoryCache()
+    loads = []
+
+    def load():
+        loads.append(1)
+        return None if len(loads) == 1 else {'status': 'processing'}
+
+    assert cache.get_or_load('video', load) is None
+    # Written since: the next read finds it instead of a cached miss
+    assert cache.get_or_load('video', load) == {'status': 'processing'}
+    assert cache.get_or_load('video', load) == {'status': 'processing'}
+    assert len(loads) == 2
+
+
+def test_load_overlapping_an_invalidation_is_not_stored():
+    cache = MemoryCache()
+    loading = threading.Event()
+    invalidated = threading.Event()
+    results = []
+
+    def stale_load():
+        loading.set()
+        invalidated.wait(5)
+        return {'status': 'processing'}
+
+    reader = threading.Thread(target=lambda: results.append(cache.get_or_load('video', stale_load)))
+    reader.start()
+    loading.wait(5)
+    # The write lands while the read is still in flight
+    cache.pop('video')
+    invalidated.set()
+    reader.join(5)
+
+    # The caller still gets what it read, but the cache does not keep it
+    assert results == [{'status': 'processing'}]
+    assert cache.get_or_load('video', lambda: {'status': 'completed'}) == {'status': 'completed'}
+    assert cache.get('video') == {'status': 'completed'}
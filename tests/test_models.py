@@ -0,0 +1,29 @@
+# tests/test_models.py
+import base64
+
+import pytest
+from bson import ObjectId, json_util
+
+import models
+
+
+def raw_cursor(created_at, video_id):
+    return base64.urlsafe_b64encode(json_util.dumps([created_at, video_id]).encode('utf-8')).decode('ascii')
+
+
+def test_cursor_round_trip():
+    video = {'created_at': '2024-05-01 12:00:00', '_id': ObjectId()}
+
+    assert models.decode_cursor(models.encode_cursor(video)) == (video['created_at'], video['_id'])
+
+
+@pytest.mark.parametrize('cursor', [
+    raw_cursor({'$gt': ''}, ObjectId()),
+    raw_cursor('2024-05-01 12:00:00', {'$ne': None}),
+    raw_cursor('2024-05-01 12:00:00', str(ObjectId())),
+    raw_cursor(1714564800, ObjectId()),
+    'not base64 at all!',
+])
+def test_decode_cursor_rejects_anything_but_a_string_and_an_object_id(cursor):
+    with pytest.raises(models.InvalidCursor):
+        models.decode_cursor(cursor)
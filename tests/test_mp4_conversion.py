@@ -0,0 +1,33 @@
+# tests/test_mp4_conversion.py
+import shutil
+import subprocess
+
+import pytest
+
+import helpers
+
+pytestmark = pytest.mark.skipif(not shutil.which('ffmpeg'), reason="needs ffmpeg")
+
+H264 = ['-c:v', 'libx264', '-pix_fmt', 'yuv420p']
+VP8 = ['-c:v', 'libvpx']
+
+
+def make_video(path, video_args, audio_args):
+    command = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc2=s=160x120:r=10']
+    if audio_args:
+        command += ['-f', 'lavfi', '-i', 'sine=frequency=300'] + audio_args
+    subprocess.run(command + ['-t', '1'] + video_args + [str(path)], check=True)
+    return str(path)
+
+
+@pytest.mark.parametrize('name, video_args, audio_args, expected', [
+    ('h264_aac.mp4', H264, ['-c:a', 'aac'], ('none', ['-c', 'copy'])),
+    ('h264_silent.mp4', H264, None, ('none', ['-c', 'copy'])),
+    ('h264_aac.mkv', H264, ['-c:a', 'aac'], ('remux', ['-c', 'copy'])),
+    ('h264_aac.mov', H264, ['-c:a', 'aac'], ('remux', ['-c', 'copy'])),
+    ('h264_mp3.mkv', H264, ['-c:a', 'libmp3lame'], ('transcode', ['-c:v', 'copy', '-c:a', 'aac'])),
+    ('vp8_vorbis.webm', VP8, ['-c:a', 'libvorbis'], ('transcode', ['-c:v', 'libx264', '-c:a', 'aac'])),
+    ('vp8_silent.webm', VP8, None, ('transcode', ['-c:v', 'libx264', '-c:a', 'copy'])),
+])
+def test_plan_mp4_conversion(tmp_path, name, video_args, audio_args, expected):
+    assert helpers.plan_mp4_conversion(make_video(tmp_path / name, video_args, audio_args)) == expected
@@ -0,0 +1,87 @@
+# tests/test_pipeline.py
+import os
+import time
+import random
+import threading
+
+from pipeline import upload_in_order
+
+UPLOAD_LATENCY = 0.1
+
+
+class FakeS3:
+    """Stand-in for the bucket: keeps uploaded bytes in memory and takes UPLOAD_LATENCY (with jitter,
+    so uploads finish out of order) per PUT."""
+
+    def __init__(self, latency=UPLOAD_LATENCY):
+        self.latency = latency
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def upload(self, path, key):
+        time.sleep(self.latency * random.uniform(0.5, 1.5))
+        with open(path, 'rb') as f:
+            data = f.read()
+        with self._lock:
+            self.objects[key] = data
+        return f"https://bucket.example/{key}"
+
+
+def make_segments(directory, count, slots=None, on_disk=None):
+    for index in range(count):
+        if slots is not None:
+            slots.acquire()
+        path = os.path.join(directory, f"segment_{index:05d}.mp4")
+        with open(path, 'wb') as f:
+            f.write(f"segment {index}".encode())
+        if on_disk is not None:
+            on_disk.append(len(os.listdir(directory)))
+        yield path
+
+
+def test_results_keep_segment_order(tmp_path):
+    s3 = FakeS3()
+    urls = upload_in_order(make_segments(str(tmp_path), 12), s3.upload, max_workers=4)
+
+    assert urls == [f"https://bucket.example/segment_{index:05d}.mp4" for index in range(12)]
+    assert s3.objects['segment_00003.mp4'] == b'segment 3'
+    assert os.listdir(tmp_path) == []
+
+
+def test_concurrent_uploads_beat_sequential(tmp_path):
+    count = 12
+    s3 = FakeS3()
+
+    started = time.perf_counter()
+    sequential = [s3.upload(path, os.path.basename(path)) for path in make_segments(str(tmp_path), count)]
+    sequential_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    pipelined = upload_in_order(make_segments(str(tmp_path), count), s3.upload, max_workers=4)
+    pipelined_seconds = time.perf_counter() - started
+
+    assert pipelined == sequential
+    # Four workers should take roughly a quarter of the time; allow generous scheduling slack
+    assert pipelined_seconds < sequential_seconds / 2
+
+
+def test_failed_upload_leaves_a_gap(tmp_path):
+    def upload(path, key):
+        if key == 'segment_00001.mp4':
+            raise IOError("connection reset")
+        return key
+
+    assert upload_in_order(make_segments(str(tmp_path), 3), upload, max_workers=2) == [
+        'segment_00000.mp4', None, 'segment_00002.mp4']
+
+
+def test_slots_cap_segments_on_disk(tmp_path):
+    max_pending = 3
+    slots = threading.BoundedSemaphore(max_pending)
+    on_disk = []
+    s3 = FakeS3(latency=0.02)
+
+    upload_in_order(make_segments(str(tmp_path), 20, slots, on_disk), s3.upload, slots=slots,
+                    max_workers=2, max_pending=max_pending)
+
+    assert max(on_disk) <= max_pending
@@ -0,0 +1,29 @@
+# tests/test_progress.py
+import shutil
+import subprocess
+
+import pytest
+
+import progress
+
+pytestmark = pytest.mark.skipif(not shutil.which('ffmpeg'), reason="needs ffmpeg")
+
+
+def test_failed_ffmpeg_reports_its_stderr(tmp_path):
+    missing = str(tmp_path / 'missing.mp4')
+
+    with pytest.raises(subprocess.CalledProcessError) as raised:
+        progress.run_ffmpeg(['ffmpeg', '-y', '-i', missing, str(tmp_path / 'out.mp4')])
+
+    assert 'No such file or directory' in raised.value.stderr
+
+
+def test_stderr_is_trimmed_to_its_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(progress, 'STDERR_TAIL_LINES', 3)
+
+    with pytest.raises(subprocess.CalledProcessError) as raised:
+        # Without -loglevel error ffmpeg prints its banner before failing on the missing input
+        progress.run_ffmpeg(['ffmpeg', '-y', '-i', str(tmp_path / 'missing.mp4'), str(tmp_path / 'out.mp4')])
+
+    assert len(raised.value.stderr.splitlines()) <= 3
+    assert 'No such file or directory' in raised.value.stderr
@@ -0,0 +1,48 @@
+# tests/test_render.py
+import os
+import shutil
+import subprocess
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not shutil.which('ffmpeg'), reason="needs ffmpeg")
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('uploads')
+    import app
+    monkeypatch.setattr(app, 'UPLOAD_FOLDER', 'uploads')
+    # A short background clip (it is looped anyway) keeps its one-off encode quick
+    get_background_clip = app.get_background_clip
+    monkeypatch.setattr(app, 'get_background_clip', lambda color, size: get_background_clip(color, size, seconds=2))
+    return app
+
+
+def make_speech(monkeypatch, app_module, codec_args, extension):
+    def generate_audio_from_script(script_text):
+        audio_file = os.path.join('uploads', f"speech{extension}")
+        subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'sine=frequency=300',
+                        '-t', '3'] + codec_args + [audio_file], check=True)
+        return audio_file
+    monkeypatch.setattr(app_module, 'generate_audio_from_script', generate_audio_from_script)
+
+
+@pytest.mark.parametrize('codec_args, extension, expected_codec', [
+    (['-c:a', 'pcm_s16le'], '.wav', 'aac'),  # pyttsx3 writes PCM WAV, which MP4 can't carry
+    (['-c:a', 'libmp3lame'], '.mp3', 'mp3'),  # gTTS MP3 is copied as is
+])
+def test_render_script_video(app_module, monkeypatch, codec_args, extension, expected_codec):
+    make_speech(monkeypatch, app_module, codec_args, extension)
+
+    video_file = app_module.render_script_video("Hello there.")
+
+    info = app_module.probe(video_file)
+    assert info.video_codec == 'h264'
+    assert info.audio_codec == expected_codec
+    assert info.audio_duration == pytest.approx(3, abs=0.1)
+    # The looped background covers the whole speech, and ends within a frame after it
+    assert info.video.duration == pytest.approx(info.audio.duration, abs=0.1)
+    assert info.video.duration >= info.audio.duration
+    assert set(os.listdir('uploads')) == {os.path.basename(video_file), 'backgrounds'}
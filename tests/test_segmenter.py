@@ -0,0 +1,38 @@
+# tests/test_segmenter.py
+import shutil
+import subprocess
+
+import pytest
+
+from media_probe import probe
+from segmenter import segment_video
+
+pytestmark = pytest.mark.skipif(not shutil.which('ffmpeg'), reason="needs ffmpeg")
+
+
+@pytest.fixture(scope='module')
+def source(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('source') / 'source.mp4')
+    # Natural keyframes every 250 frames (8.3s) never line up with a 10s boundary
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', 'testsrc2=s=160x120:r=30',
+        '-f', 'lavfi', '-i', 'sine=frequency=440',
+        '-t', '25', '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', path
+    ], check=True)
+    return path
+
+
+def test_exact_segments_are_cut_on_the_boundaries(source, tmp_path):
+    segments = list(segment_video(source, 10, str(tmp_path), exact=True, duration=25))
+
+    durations = [probe(segment).duration for segment in segments]
+    assert len(durations) == 3
+    assert durations[0] == pytest.approx(10, abs=0.1)
+    assert durations[1] == pytest.approx(10, abs=0.1)
+
+
+def test_copy_segments_cover_the_source(source, tmp_path):
+    segments = list(segment_video(source, 10, str(tmp_path)))
+
+    assert sum(probe(segment).duration for segment in segments) == pytest.approx(25, abs=0.2)
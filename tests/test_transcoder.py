@@ -0,0 +1,73 @@
+# tests/test_transcoder.py
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import transcoder
+from media_probe import probe
+
+needs_ffmpeg = pytest.mark.skipif(not shutil.which('ffmpeg'), reason="needs ffmpeg")
+
+
+@pytest.fixture
+def eight_cpus(monkeypatch):
+    monkeypatch.setattr(transcoder.os, 'sched_getaffinity', lambda pid: set(range(8)), raising=False)
+
+
+def write_cgroup(root, name, content):
+    path = root / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+@pytest.mark.parametrize('cpu_max, expected', [
+    ('max 100000\n', 8),  # No quota: the affinity mask decides
+    ('200000 100000\n', 2),  # Two CPUs' worth of time per period
+    ('150000 100000\n', 1),  # Fractional quotas round down
+    ('50000 100000\n', 1),  # but never below one CPU
+])
+def test_cgroup_v2_quota(tmp_path, eight_cpus, cpu_max, expected):
+    write_cgroup(tmp_path, 'cpu.max', cpu_max)
+
+    assert transcoder.available_cpus(str(tmp_path)) == expected
+
+
+def test_cgroup_v1_quota(tmp_path, eight_cpus):
+    write_cgroup(tmp_path, 'cpu/cpu.cfs_quota_us', '300000\n')
+    write_cgroup(tmp_path, 'cpu/cpu.cfs_period_us', '100000\n')
+
+    assert transcoder.available_cpus(str(tmp_path)) == 3
+
+
+def test_no_cgroup_files(tmp_path, eight_cpus):
+    assert transcoder.available_cpus(str(tmp_path / 'missing')) == 8
+
+
+# Colour of the frame shown at `seconds`, averaged down to one RGB pixel
+def frame_colour(video_file, seconds):
+    pixel = subprocess.run([
+        'ffmpeg', '-loglevel', 'error', '-ss', str(seconds), '-i', video_file,
+        '-frames:v', '1', '-vf', 'scale=1:1', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-'
+    ], stdout=subprocess.PIPE, check=True).stdout
+    return max(range(3), key=lambda channel: pixel[channel])
+
+
+@needs_ffmpeg
+def test_chunks_are_encoded_in_parallel_and_joined_in_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcoder, 'UPLOAD_FOLDER', str(tmp_path))
+    source = str(tmp_path / 'source.mp4')
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'color=c=gray:s=320x240:r=25',
+        '-t', '6', '-c:v', 'libx264', '-g', '25', '-pix_fmt', 'yuv420p', source
+    ], check=True)
+    # Chunk i is tinted red, green or blue, so the output shows which chunk landed where
+    effects = ['lutrgb=r=255:g=0:b=0', 'lutrgb=r=0:g=255:b=0', 'lutrgb=r=0:g=0:b=255']
+    output = str(tmp_path / 'output.mp4')
+
+    transcoder.transcode_segments(source, 2, output, segment_effects=effects, workers=3, threads=1)
+
+    assert probe(output).duration == pytest.approx(6, abs=0.1)
+    assert [frame_colour(output, seconds) for seconds in (1, 3, 5)] == [0, 1, 2]
+    assert sorted(os.listdir(tmp_path)) == ['output.mp4', 'source.mp4']
@@ -0,0 +1,68 @@
+# tests/test_tts.py
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import tts
+import tts_cache
+from media_probe import probe
+
+
+def test_configured_engine_overrides_the_default_and_is_reused(monkeypatch):
+    monkeypatch.setattr(tts, 'TTS_ENGINE', 'fake')
+    monkeypatch.setattr(tts, 'TTS_VOICE', 'co.uk')
+    monkeypatch.setattr(tts, '_tts_backends', {})
+
+    backend = tts.get_tts_backend('gtts')
+
+    assert isinstance(backend, tts.FakeBackend)
+    assert backend.voice == 'co.uk'
+    assert tts.get_tts_backend('pyttsx3') is backend
+
+
+def test_split_sentences_packs_up_to_max_chars():
+    chunks = tts.split_sentences("One two. Three four five. Six seven eight nine ten eleven twelve.", max_chars=30)
+
+    assert chunks == ['One two. Three four five.', 'Six seven eight nine ten', 'eleven twelve.']
+
+
+class WavBackend(tts.FakeBackend):
+    """FakeBackend writing PCM WAV, like pyttsx3, with each chunk's duration recorded."""
+
+    name = 'fake-wav'
+    extension = '.wav'
+
+    def __init__(self):
+        super().__init__()
+        self.durations = []
+
+    def synthesize(self, text, output_file):
+        duration = len(text.split()) * self.seconds_per_word
+        with self._calls_lock:
+            self.calls += 1
+            self.durations.append(duration)
+        subprocess.run([
+            'ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'sine=frequency=300:sample_rate=22050',
+            '-t', f"{duration:.2f}", '-c:a', 'pcm_s16le', output_file
+        ], check=True)
+
+
+@pytest.mark.skipif(not shutil.which('ffmpeg'), reason="needs ffmpeg")
+def test_wav_chunks_are_joined_into_one_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('uploads')
+    monkeypatch.setattr(tts_cache, 'TTS_CACHE_DIR', str(tmp_path / 'tts_cache'))
+    monkeypatch.setattr(tts_cache, '_tts_cache', None)
+    # One sentence per chunk
+    split_sentences = tts.split_sentences
+    monkeypatch.setattr(tts, 'split_sentences', lambda text: split_sentences(text, max_chars=20))
+    backend = WavBackend()
+    text = "One two three. Four five six seven. Eight nine."
+
+    tts.synthesize_speech(text, 'uploads/speech.wav', backend, workers=3)
+
+    assert backend.calls == 3
+    assert probe('uploads/speech.wav').audio_duration == pytest.approx(sum(backend.durations), abs=0.05)
+    assert os.listdir('uploads') == ['speech.wav']
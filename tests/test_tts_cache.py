@@ -0,0 +1,71 @@
+# tests/test_tts_cache.py
+import os
+import shutil
+import time
+import threading
+
+import pytest
+
+import tts_cache
+from media_probe import probe
+from tts import FakeBackend, synthesize_speech
+
+pytestmark = pytest.mark.skipif(not shutil.which('ffmpeg'), reason="needs ffmpeg")
+
+SCRIPT = ("Welcome to our video. Today we talk about caching. "
+          "Speech for a sentence we have seen before is never synthesized again.")
+
+
+@pytest.fixture(autouse=True)
+def tts_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('uploads')
+    monkeypatch.setattr(tts_cache, 'TTS_CACHE_DIR', str(tmp_path / 'tts_cache'))
+    monkeypatch.setattr(tts_cache, '_tts_cache', None)
+    return tmp_path / 'tts_cache'
+
+
+def test_repeated_script_is_not_synthesized_again(tts_cache_dir):
+    backend = FakeBackend()
+    synthesize_speech(SCRIPT, 'uploads/first.mp3', backend)
+    first_calls = backend.calls
+
+    synthesize_speech(SCRIPT, 'uploads/second.mp3', backend)
+
+    assert first_calls > 0
+    assert backend.calls == first_calls
+    assert probe('uploads/second.mp3').audio_duration == pytest.approx(probe('uploads/first.mp3').audio_duration)
+
+
+def test_reflowed_script_hits_and_other_voice_misses(tts_cache_dir):
+    backend = FakeBackend()
+    synthesize_speech(SCRIPT, 'uploads/first.mp3', backend)
+    first_calls = backend.calls
+
+    synthesize_speech(SCRIPT.replace(' ', '\n  '), 'uploads/reflowed.mp3', backend)
+    assert backend.calls == first_calls
+
+    other_voice = FakeBackend(voice='co.uk')
+    synthesize_speech(SCRIPT, 'uploads/other_voice.mp3', other_voice)
+    assert other_voice.calls == first_calls
+
+
+def test_concurrent_misses_share_one_synthesis(tts_cache_dir):
+    calls = []
+
+    def synthesize(text, path):
+        calls.append(text)
+        time.sleep(0.3)  # Long enough for every caller to arrive while the first is still synthesizing
+        with open(path, 'wb') as f:
+            f.write(b'speech')
+
+    outputs = [f'uploads/out_{index}.mp3' for index in range(6)]
+    threads = [threading.Thread(target=tts_cache.synthesize_cached, args=("Hello.", output, synthesize))
+               for output in outputs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(open(output, 'rb').read() == b'speech' for output in outputs)
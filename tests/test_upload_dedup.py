@@ -0,0 +1,65 @@
+# tests/test_upload_dedup.py
+import boto3
+import pytest
+
+import helpers
+from memory_cache import MemoryCache
+
+moto = pytest.importorskip('moto')
+
+BUCKET = 'bucket'
+
+
+@pytest.fixture
+def puts(monkeypatch):
+    monkeypatch.setenv('AWS_S3_BUCKET', BUCKET)
+    monkeypatch.setenv('AWS_S3_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY', 'test')
+    monkeypatch.setenv('AWS_SECRET_KEY', 'test')
+    monkeypatch.setattr(helpers, '_uploaded_digests', MemoryCache(max_entries=16, ttl=60))
+    with moto.mock_aws():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        # A shared client built inside the mock, counting the PutObject calls it sends
+        monkeypatch.setattr(helpers, '_s3_client', None)
+        monkeypatch.setattr(helpers, '_s3_transfer', None)
+        keys = []
+        helpers.get_s3_client().meta.events.register(
+            'before-parameter-build.s3.PutObject', lambda params, **kwargs: keys.append(params['Key']))
+        yield keys
+
+
+def test_identical_content_is_uploaded_once(tmp_path, puts):
+    first = tmp_path / 'first.mp4'
+    second = tmp_path / 'second.mp4'
+    first.write_bytes(b'same bytes')
+    second.write_bytes(b'same bytes')
+
+    url = helpers.upload_to_s3(str(first), 'first.mp4', dedup=True)
+
+    assert helpers.upload_to_s3(str(second), 'second.mp4', dedup=True) == url
+    assert len(puts) == 1
+    assert url == helpers.s3_object_url(puts[0])
+    assert puts[0] == f"{helpers.file_digest(str(first))}.mp4"
+
+
+def test_existing_object_is_not_uploaded_again(tmp_path, puts, monkeypatch):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'some video')
+    url = helpers.upload_to_s3(str(path), 'video.mp4', dedup=True)
+
+    # A new process (or an evicted digest): the HEAD request finds the object already in the bucket
+    monkeypatch.setattr(helpers, '_uploaded_digests', MemoryCache(max_entries=16, ttl=60))
+
+    assert helpers.upload_to_s3(str(path), 'other.mp4', dedup=True) == url
+    assert len(puts) == 1
+
+
+def test_remembered_digests_are_bounded(tmp_path, puts, monkeypatch):
+    monkeypatch.setattr(helpers, '_uploaded_digests', MemoryCache(max_entries=2, ttl=60))
+    for index in range(5):
+        path = tmp_path / f"{index}.mp4"
+        path.write_bytes(f"video {index}".encode())
+        helpers.upload_to_s3(str(path), path.name, dedup=True)
+
+    assert helpers._uploaded_digests.stats()['entries'] == 2
+    assert len(puts) == 5
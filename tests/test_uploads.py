@@ -0,0 +1,83 @@
+# tests/test_uploads.py
+import threading
+
+import pytest
+from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import ClientError
+
+import helpers
+
+
+class FlakyTransfer:
+    """Stub for the shared S3Transfer: fails the first attempts for some keys with the given error code
+    (wrapped the way S3Transfer wraps ClientError) and records every call."""
+
+    def __init__(self, failures):
+        self.failures = dict(failures)  # key -> list of error codes to raise, in order
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def upload_file(self, file_path, bucket, key, callback=None):
+        with self._lock:
+            self.calls.append(key)
+            codes = self.failures.get(key)
+            code = codes.pop(0) if codes else None
+        if code:
+            try:
+                raise ClientError({'Error': {'Code': code, 'Message': code}}, 'PutObject')
+            except ClientError as e:
+                raise S3UploadFailedError(f"Failed to upload {file_path} to {bucket}/{key}: {e}") from e
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setenv('AWS_S3_BUCKET', 'bucket')
+    monkeypatch.setenv('AWS_S3_REGION', 'us-east-1')
+    monkeypatch.setattr(helpers.time, 'sleep', lambda seconds: None)
+    paths = []
+    for index in range(6):
+        path = tmp_path / f"file_{index}.mp4"
+        path.write_bytes(b'x' * index)
+        paths.append(str(path))
+    return paths
+
+
+def use_transfer(monkeypatch, transfer):
+    monkeypatch.setattr(helpers, 'get_s3_transfer', lambda: transfer)
+
+
+def test_upload_many_keeps_input_order(files, monkeypatch):
+    transfer = FlakyTransfer({})
+    use_transfer(monkeypatch, transfer)
+
+    results = helpers.upload_many(files, max_workers=4, dedup=False)
+
+    assert [result.path for result in results] == files
+    assert [result.url for result in results] == [
+        f"https://bucket.s3.us-east-1.amazonaws.com/file_{index}.mp4" for index in range(6)]
+    assert all(result.error is None for result in results)
+
+
+def test_upload_many_retries_slowdown_then_succeeds(files, monkeypatch):
+    transfer = FlakyTransfer({'file_2.mp4': ['SlowDown', 'SlowDown']})
+    use_transfer(monkeypatch, transfer)
+
+    results = helpers.upload_many(files, max_workers=4, dedup=False)
+
+    assert results[2].url == "https://bucket.s3.us-east-1.amazonaws.com/file_2.mp4"
+    assert results[2].error is None
+    assert transfer.calls.count('file_2.mp4') == 3
+
+
+def test_upload_many_reports_per_file_errors(files, monkeypatch):
+    transfer = FlakyTransfer({'file_1.mp4': ['AccessDenied'], 'file_4.mp4': ['SlowDown'] * 10})
+    use_transfer(monkeypatch, transfer)
+
+    results = helpers.upload_many(files, max_workers=4, dedup=False)
+
+    # Permanent errors are not retried, transient ones give up after S3_RETRY_ATTEMPTS
+    assert results[1].url is None and isinstance(results[1].error, S3UploadFailedError)
+    assert transfer.calls.count('file_1.mp4') == 1
+    assert results[4].url is None and results[4].error is not None
+    assert transfer.calls.count('file_4.mp4') == helpers.S3_RETRY_ATTEMPTS
+    assert [result.url is not None for result in results] == [True, False, True, True, False, True]
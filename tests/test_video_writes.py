@@ -0,0 +1,86 @@
+# tests/test_video_writes.py
+from types import SimpleNamespace
+
+import pytest
+
+import models
+from write_buffer import WriteBehindBuffer
+
+mongomock = pytest.importorskip('mongomock')
+
+
+class CountingCollection:
+    """mongomock collection that counts bulk_write round trips."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.bulk_writes = 0
+
+    def bulk_write(self, operations, ordered=True):
+        self.bulk_writes += 1
+        return self.collection.bulk_write(operations, ordered=ordered)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+@pytest.fixture
+def videos(monkeypatch):
+    collection = mongomock.MongoClient().db.videos
+    collection.create_index('video_url', unique=True)
+    videos = CountingCollection(collection)
+    monkeypatch.setattr(models, 'mongo', SimpleNamespace(db=SimpleNamespace(videos=videos)))
+    # A long delay so only a full batch or an explicit flush writes
+    buffer = WriteBehindBuffer(models._write_video_batch, max_batch=100, max_delay=60, name='test-video-writes')
+    monkeypatch.setattr(models, 'video_writes', buffer)
+    yield videos
+    buffer.close()
+
+
+def test_saves_are_written_in_batches(videos):
+    for index in range(250):
+        assert models.save_video(f"https://example.com/{index}.mp4", 10, []) is not None
+
+    models.video_writes.flush()
+
+    assert videos.count_documents({}) == 250
+    assert videos.bulk_writes == 3
+
+
+def test_duplicate_insert_is_reported_to_a_waiting_caller(videos):
+    models.save_video("https://example.com/a.mp4", 10, [])
+    models.video_writes.flush()
+
+    models.video_writes.max_delay = 0.05
+    assert models.save_video("https://example.com/a.mp4", 10, [], wait=True) is None
+    assert models.save_video("https://example.com/b.mp4", 10, [], wait=True) is not None
+    assert videos.count_documents({}) == 2
+
+
+def test_failed_operation_does_not_stop_the_rest_of_its_batch(videos):
+    models.save_video("https://example.com/a.mp4", 10, [])
+    models.save_video("https://example.com/a.mp4", 10, [])
+    models.save_video("https://example.com/b.mp4", 10, [])
+
+    models.video_writes.flush()
+
+    assert sorted(video['video_url'] for video in videos.find()) == [
+        "https://example.com/a.mp4", "https://example.com/b.mp4"]
+    # One round trip up to the duplicate, one for what follows it
+    assert videos.bulk_writes == 2
+
+
+def test_waiting_save_inserts_directly_when_the_buffer_is_slow(videos, monkeypatch):
+    monkeypatch.setattr(models, 'VIDEO_WRITE_WAIT_TIMEOUT', 0.1)
+    models.save_video("https://example.com/a.mp4", 10, [])
+    models.video_writes.flush()
+
+    # max_delay is 60s, so only the direct insert can get these in before the timeout
+    video = models.save_video("https://example.com/b.mp4", 10, [], wait=True)
+    assert video is not None
+    assert videos.find_one({'_id': video['_id']})['video_url'] == "https://example.com/b.mp4"
+    assert models.save_video("https://example.com/a.mp4", 10, [], wait=True) is None
+
+    # The buffered copies that follow fail on their own and change nothing
+    models.video_writes.flush()
+    assert videos.count_documents({}) == 2
@@ -0,0 +1,31 @@
+# tests/test_write_buffer.py
+import os
+
+import pytest
+
+from write_buffer import WriteBehindBuffer
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+@pytest.mark.parametrize('used_before_fork', [False, True])
+def test_forked_child_writes_its_own_operations(used_before_fork):
+    written = []
+    buffer = WriteBehindBuffer(written.extend, max_batch=100, max_delay=0.05, name='test-fork')
+    if used_before_fork:
+        buffer.add('parent').result(timeout=5)
+
+    pid = os.fork()
+    if pid == 0:
+        # Child: exit status 0 only if its add() reaches write() on a writer thread of its own
+        try:
+            buffer.add('child').result(timeout=5)
+            os._exit(0 if written[-1] == 'child' else 1)
+        except BaseException:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    # The parent's buffer is unaffected
+    buffer.add('parent again').result(timeout=5)
+    assert written[-1] == 'parent again'
+    buffer.close()
@@ -0,0 +1,109 @@
+# transcoder.py
+import os
+import uuid
+import logging
+import subprocess
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import progress
+from segmenter import segment_video
+
+# Configuration
+UPLOAD_FOLDER = 'uploads'
+TRANSCODE_WORKERS = int(os.getenv('TRANSCODE_WORKERS', 0))  # Parallel ffmpeg encoders, 0 = one per available CPU
+TRANSCODE_THREADS = int(os.getenv('TRANSCODE_THREADS', 0))  # -threads per encoder, 0 = share the CPUs evenly
+
+
+# CPUs this process may actually use: the affinity mask, further limited by a cgroup CPU quota
+# (containers often see every host core but are throttled to a few).
+def available_cpus(cgroup_root='/sys/fs/cgroup'):
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open(os.path.join(cgroup_root, 'cpu.max')) as f:
+            limit, period = f.read().split()
+            if limit != 'max':
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open(os.path.join(cgroup_root, 'cpu', 'cpu.cfs_quota_us')) as f:
+                limit = int(f.read())
+            with open(os.path.join(cgroup_root, 'cpu', 'cpu.cfs_period_us')) as f:
+                period = int(f.read())
+            if limit > 0 and period > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota:
+        cpus = min(cpus, max(1, int(quota)))
+    return max(1, cpus)
+
+
+def _encode_chunk(chunk_file, video_filter, threads, chunk=None, duration=None):
+    encoded_file = os.path.join(os.path.dirname(chunk_file), f"encoded_{os.path.basename(chunk_file)}")
+    command = ['ffmpeg', '-y', '-loglevel', 'error', '-i', chunk_file]
+    if video_filter:
+        command += ['-vf', video_filter]
+    # Every chunk gets identical encoder settings so the concat demuxer can join them with stream copy
+    command += ['-an', '-c:v', 'libx264', '-threads', str(threads), encoded_file]
+    try:
+        progress.run_ffmpeg(command, duration, 'encode-chunk', chunk=chunk)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Error encoding chunk {chunk_file}: {e}")
+        raise
+    finally:
+        os.remove(chunk_file)
+    return encoded_file
+
+
+# Join encoded chunks losslessly with the concat demuxer
+def concat_files(files, output_file):
+    concat_file = os.path.join(UPLOAD_FOLDER, f"concat_list_{uuid.uuid4().hex}.txt")
+    try:
+        with open(concat_file, 'w') as f:
+            for path in files:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+        subprocess.run([
+            'ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', concat_file, '-c', 'copy', output_file
+        ], check=True)
+    finally:
+        if os.path.exists(concat_file):
+            os.remove(concat_file)
+    return output_file
+
+
+# Re-encode video_file in keyframe-aligned chunks of about segment_length seconds, several chunks at
+# once, and join the results into output_file (video only). segment_effects[i] is an optional ffmpeg
+# video filter for chunk i. Chunks are cut with stream copy and handed to the encoders as they appear.
+def transcode_segments(video_file, segment_length, output_file, segment_effects=None, workers=None, threads=None):
+    cpus = available_cpus()
+    workers = workers or TRANSCODE_WORKERS or cpus
+    threads = threads or TRANSCODE_THREADS or max(1, cpus // workers)
+    segment_effects = segment_effects or []
+    logging.info(f"Transcoding {video_file} with {workers} encoders x {threads} threads")
+
+    futures = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for index, chunk_file in enumerate(segment_video(video_file, segment_length, UPLOAD_FOLDER)):
+                video_filter = segment_effects[index] if index < len(segment_effects) else None
+                # Each encoder reports its progress under the submitting job
+                futures.append(executor.submit(contextvars.copy_context().run, _encode_chunk, chunk_file,
+                                               video_filter, threads, index + 1, segment_length))
+            encoded_files = []
+            for index, future in enumerate(futures):
+                encoded_files.append(future.result())
+                progress.report('encode', final=True, chunk=index + 1, total=len(futures))
+        return concat_files(encoded_files, output_file)
+    finally:
+        for future in futures:
+            if future.done() and not future.exception() and os.path.exists(future.result()):
+                os.remove(future.result())
@@ -0,0 +1,252 @@
+# tts.py
+import os
+import re
+import uuid
+import logging
+import subprocess
+import queue
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import progress
+from tts_cache import normalize_text, synthesize_cached
+from transcoder import concat_files
+
+# Configuration
+UPLOAD_FOLDER = 'uploads'
+TTS_CHUNK_CHARS = int(os.getenv('TTS_CHUNK_CHARS', 400))  # Longest text sent to the engine in one call
+TTS_WORKERS = int(os.getenv('TTS_WORKERS', 4))  # Chunks synthesized at once
+TTS_ENGINE = os.getenv('TTS_ENGINE')  # 'gtts', 'pyttsx3' or 'fake'; overrides every caller's default when set
+TTS_LANG = os.getenv('TTS_LANG', 'en')
+TTS_VOICE = os.getenv('TTS_VOICE') or None  # pyttsx3 voice id, or the gTTS accent domain (e.g. 'co.uk')
+
+_SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+')
+
+
+class TTSBackend:
+    """Interface for speech engines. synthesize(text, output_file) writes one utterance in the
+    backend's format (extension) and may be called from several threads at once; concurrency says how
+    many calls are worth running in parallel. name, lang and voice are part of the TTS cache key.
+    A backend is created once per process (see get_tts_backend), so setup belongs in __init__."""
+
+    name = None
+    extension = '.mp3'
+    concurrency = 1
+
+    def __init__(self, lang='en', voice=None):
+        self.lang = lang
+        self.voice = voice
+
+    def synthesize(self, text, output_file):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS over the network. Produces MP3; calls are independent, so chunks run in parallel.
+    voice selects the accent through the Google domain (tld), e.g. 'co.uk'."""
+
+    name = 'gtts'
+    extension = '.mp3'
+    concurrency = TTS_WORKERS
+
+    def __init__(self, lang='en', voice=None):
+        from gtts import gTTS
+
+        super().__init__(lang, voice)
+        self._gtts = gTTS
+
+    def synthesize(self, text, output_file):
+        self._gtts(text, lang=self.lang, tld=self.voice or 'com').save(output_file)
+
+
+class Pyttsx3Backend(TTSBackend):
+    """Local system voices (espeak, SAPI5, NSSpeechSynthesizer) through pyttsx3. Produces WAV.
+    One engine is initialized when the backend is created and lives on its own thread, because pyttsx3
+    engines are neither reentrant nor safe to drive from other threads; callers queue up in front of it."""
+
+    name = 'pyttsx3'
+    extension = '.wav'
+    concurrency = 1
+
+    def __init__(self, lang='en', voice=None):
+        super().__init__(lang, voice)
+        self._requests = queue.Queue()
+        self._ready = threading.Event()
+        self._init_error = None
+        self._thread = threading.Thread(target=self._serve, name='pyttsx3-engine', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._init_error:
+            raise self._init_error
+
+    def _serve(self):
+        try:
+            import pyttsx3
+
+            engine = pyttsx3.init()
+            if self.voice:
+                engine.setProperty('voice', self.voice)
+        except Exception as e:
+            self._init_error = e
+            return
+        finally:
+            self._ready.set()
+        logging.info("pyttsx3 engine ready")
+
+        while True:
+            item = self._requests.get()
+            if item is None:
+                engine.stop()
+                return
+            text, output_file, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                engine.save_to_file(text, output_file)
+                engine.runAndWait()
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(output_file)
+
+    def synthesize(self, text, output_file):
+        future = Future()
+        self._requests.put((text, output_file, future))
+        return future.result()
+
+    def close(self):
+        self._requests.put(None)
+        self._thread.join()
+
+
+class FakeBackend(TTSBackend):
+    """Offline stand-in for tests and air-gapped setups: silent MP3 lasting roughly as long as the text
+    would take to read. Counts its calls so callers can check what was served from cache."""
+
+    name = 'fake'
+    extension = '.mp3'
+    concurrency = TTS_WORKERS
+
+    def __init__(self, lang='en', voice=None, seconds_per_word=0.3):
+        super().__init__(lang, voice)
+        self.seconds_per_word = seconds_per_word
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def synthesize(self, text, output_file):
+        with self._calls_lock:
+            self.calls += 1
+        duration = max(0.5, len(text.split()) * self.seconds_per_word)
+        subprocess.run([
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', 'anullsrc=r=24000:cl=mono', '-t', f"{duration:.2f}",
+            '-c:a', 'libmp3lame', '-b:a', '32k', output_file
+        ], check=True)
+
+
+_backend_classes = {
+    GTTSBackend.name: GTTSBackend,
+    Pyttsx3Backend.name: Pyttsx3Backend,
+    FakeBackend.name: FakeBackend,
+}
+_tts_backends = {}
+_tts_backends_lock = threading.Lock()
+
+# Process-wide backend for the configured engine: TTS_ENGINE when set, otherwise the caller's default.
+# Each engine is set up once per process and reused by every request after that.
+def get_tts_backend(default='gtts'):
+    name = (TTS_ENGINE or default).lower()
+    if name not in _backend_classes:
+        raise ValueError(f"Unknown TTS engine: {name}")
+    with _tts_backends_lock:
+        backend = _tts_backends.get(name)
+        if backend is None:
+            backend = _backend_classes[name](lang=TTS_LANG, voice=TTS_VOICE)
+            _tts_backends[name] = backend
+    return backend
+
+
+# Split text at sentence boundaries into chunks of at most max_chars, packing short sentences together.
+# A single sentence longer than max_chars is broken between words.
+def split_sentences(text, max_chars=TTS_CHUNK_CHARS):
+    chunks = []
+    current = ''
+    for sentence in _SENTENCE_END.split(normalize_text(text)):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if not sentence:
+            continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _synthesize_chunk(backend, text):
+    chunk_file = os.path.join(UPLOAD_FOLDER, f"tts_chunk_{uuid.uuid4().hex}{backend.extension}")
+    return synthesize_cached(text, chunk_file, backend.synthesize,
+                             lang=backend.lang, voice=backend.voice, engine=backend.name)
+
+
+# Synthesize the chunks of text concurrently and yield their audio files in order, each as soon as it
+# and every chunk before it are done. Every chunk goes through the TTS cache on its own, so a failed run
+# keeps the chunks that succeeded and an edited script only re-synthesizes the sentences that changed.
+# The caller owns (and removes) the yielded files.
+def iter_speech_chunks(text, backend, workers=TTS_WORKERS):
+    chunks = split_sentences(text)
+    workers = max(1, min(workers, backend.concurrency, len(chunks) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tts') as executor:
+        # Each chunk runs in a copy of the caller's context so progress still reaches the caller's job
+        futures = [executor.submit(contextvars.copy_context().run, _synthesize_chunk, backend, chunk)
+                   for chunk in chunks]
+        handed_out = 0
+        try:
+            for future in futures:
+                chunk_file = future.result()
+                handed_out += 1
+                progress.report('tts', final=handed_out == len(futures), chunk=handed_out, total=len(futures))
+                yield chunk_file
+        finally:
+            # On failure or an early close, drop queued chunks and remove finished ones nobody received
+            for future in futures[handed_out:]:
+                future.cancel()
+            executor.shutdown(wait=True)
+            for future in futures[handed_out:]:
+                if not future.cancelled() and future.exception() is None and os.path.exists(future.result()):
+                    os.remove(future.result())
+
+
+# Write speech for text to output_file (which should use backend.extension): sentence chunks are
+# synthesized in parallel, then joined with the concat demuxer (stream copy, no re-encode).
+# A repeated script is served entirely from the per-chunk cache and only the join runs again.
+def synthesize_speech(text, output_file, backend, workers=TTS_WORKERS):
+    chunk_files = []
+    try:
+        for chunk_file in iter_speech_chunks(text, backend, workers):
+            chunk_files.append(chunk_file)
+        if not chunk_files:
+            raise ValueError("Nothing to synthesize: the text is empty.")
+        if len(chunk_files) == 1:
+            os.replace(chunk_files.pop(), output_file)
+        else:
+            concat_files(chunk_files, output_file)
+    finally:
+        for chunk_file in chunk_files:
+            if os.path.exists(chunk_file):
+                os.remove(chunk_file)
+    logging.info(f"Synthesized {len(text)} characters with {backend.name}")
+    return output_file
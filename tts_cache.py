@@ -0,0 +1,70 @@
+# tts_cache.py
+import os
+import re
+import uuid
+import hashlib
+import threading
+
+from download_cache import DownloadCache, link_or_copy
+from singleflight import SingleFlight
+
+# Configuration
+UPLOAD_FOLDER = 'uploads'
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join(UPLOAD_FOLDER, 'tts_cache'))
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+TTS_CACHE_TTL = int(os.getenv('TTS_CACHE_TTL', 30 * 24 * 60 * 60))  # seconds; speech for a text never changes
+
+_tts_flights = SingleFlight()
+
+
+# Collapse whitespace so reflowed copies of the same script share an entry
+def normalize_text(text):
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+
+# Cache key covering everything that changes the audio: engine, language, voice and the text itself
+def tts_cache_key(text, lang='en', voice=None, engine='gtts'):
+    source = '\x1f'.join([engine, lang or '', voice or '', normalize_text(text)])
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+_tts_cache = None
+_tts_cache_lock = threading.Lock()
+
+# Process-wide cache, or None when disabled with TTS_CACHE_ENABLED=false
+def get_tts_cache():
+    global _tts_cache
+    if os.getenv('TTS_CACHE_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    if _tts_cache is None:
+        with _tts_cache_lock:
+            if _tts_cache is None:
+                _tts_cache = DownloadCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES, TTS_CACHE_TTL)
+    return _tts_cache
+
+
+# Write speech for text to output_file, reusing earlier audio for the same text, language, voice and engine.
+# synthesize(text, path) is only called on a miss; concurrent misses for one key share a single call.
+def synthesize_cached(text, output_file, synthesize, lang='en', voice=None, engine='gtts'):
+    cache = get_tts_cache()
+    if cache is None:
+        synthesize(text, output_file)
+        return output_file
+
+    key = tts_cache_key(text, lang, voice, engine)
+    if cache.fetch(key, output_file):
+        return output_file
+
+    def synthesize_into_cache():
+        extension = os.path.splitext(output_file)[1]
+        partial = os.path.join(UPLOAD_FOLDER, f"tts_{uuid.uuid4().hex}{extension}")
+        try:
+            synthesize(text, partial)
+            return cache.put(key, partial)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    cached_path, _ = _tts_flights.do(key, synthesize_into_cache)
+    link_or_copy(cached_path, output_file)
+    return output_file
@@ -0,0 +1,116 @@
+# write_buffer.py
+import os
+import time
+import weakref
+import logging
+import threading
+from concurrent.futures import Future
+
+
+class WriteBehindBuffer:
+    """Collects write operations off the request path and hands them to write(ops) in batches from a
+    background thread: as soon as max_batch operations are waiting, or max_delay seconds after the
+    oldest one arrived. Batches are written one at a time in the order the operations were added.
+    write may return {index in ops: exception} for operations that failed on their own; add() returns
+    a Future that fails with that exception (or whatever write raised) and succeeds otherwise.
+    The background thread starts with the first add(), in the process that adds: a buffer created
+    before a fork (e.g. Celery prefork workers importing the app) gets its own thread in each child."""
+
+    def __init__(self, write, max_batch=100, max_delay=1.0, name='write-behind'):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.operations = 0
+        self.name = name
+        self._write = write
+        self._closed = False
+        self._reset()
+        _buffers.add(self)
+
+    # Fresh state for this process: no thread yet, nothing pending, and new locks (a child process may
+    # have inherited them held by a thread that does not exist there)
+    def _reset(self):
+        self._pending = []  # (operation, future)
+        self._oldest = None  # monotonic time the oldest pending operation was added
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def add(self, operation):
+        written = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write buffer is closed.")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._pending.append((operation, written))
+            # The writer sleeps without a timeout while nothing is pending; the first operation starts
+            # its max_delay clock
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+                self._cond.notify()
+            elif len(self._pending) >= self.max_batch:
+                self._cond.notify()
+        return written
+
+    def _due(self):
+        return len(self._pending) >= self.max_batch or time.monotonic() - self._oldest >= self.max_delay
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not (self._pending and self._due()):
+                    timeout = self.max_delay - (time.monotonic() - self._oldest) if self._pending else None
+                    self._cond.wait(timeout)
+                if self._closed:
+                    return
+            self.flush()
+
+    # Write everything pending now, in max_batch sized batches
+    def flush(self):
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    batch = self._pending[:self.max_batch]
+                    self._pending = self._pending[self.max_batch:]
+                    self._oldest = time.monotonic() if self._pending else None
+                if not batch:
+                    return
+                try:
+                    errors = self._write([operation for operation, _ in batch]) or {}
+                except Exception as e:
+                    logging.error(f"Error writing batch of {len(batch)} operations: {e}")
+                    errors = dict.fromkeys(range(len(batch)), e)
+                for index, (_, written) in enumerate(batch):
+                    if index in errors:
+                        written.set_exception(errors[index])
+                    else:
+                        written.set_result(None)
+                self.batches += 1
+                self.operations += len(batch)
+
+    # Stop the background thread and write whatever is left (registered with atexit by the owner)
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+_buffers = weakref.WeakSet()
+
+
+# Operations pending at the fork belong to the parent, which writes them; the child starts empty and
+# starts its own writer thread on its first add()
+def _reset_after_fork():
+    for buffer in list(_buffers):
+        buffer._reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)